@@ -1,16 +1,164 @@
 from __future__ import annotations
 
+from heapq import heappop, heappush
+from time import perf_counter
 from typing import TYPE_CHECKING
 
 import numpy as np
-from back.direction import opposite_dir
+from back.direction import code_direction, direction_code, opposite_dir
 
 if TYPE_CHECKING:
+    from typing import Optional, Sequence
+
     from back.type_hints import Path, Position
     from back.world import AbstractGridGraph, AbstractHeuristic
 
 
 NO_PATH_FOUND = (None, None)
+# index returned with the best partial path when the budget of a search is
+# exhausted before any destination is reached
+PARTIAL_PATH = -1
+MAX_GENERATION = np.iinfo(np.uint32).max
+# number of expansions between two checks of the deadline of a search budget
+DEADLINE_CHECK_PERIOD = 16
+
+
+class SearchWorkspace:
+    """Arrays reused by the successive searches on a grid. Instead of being
+    refilled before each search, their cells are stamped with the generation of
+    the search which wrote them, and are only valid during this generation.
+
+    The workspace also counts the searches made with it and the positions they
+    expanded.
+    """
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.generation = 0
+        self.search_count = 0
+        self.expansion_count = 0
+        self.opened_generation = np.zeros((width, height), dtype=np.uint32)
+        self.closed_generation = np.zeros((width, height), dtype=np.uint32)
+        self.dist_from_src = np.zeros((width, height), dtype=np.int32)
+        self.parents = np.zeros((width, height), dtype=np.uint8)
+
+    def new_search(self) -> int:
+        """Invalidates the content of the workspace and returns the generation
+        of the new search.
+        """
+        self.generation += 1
+        if self.generation == MAX_GENERATION:
+            self.opened_generation.fill(0)
+            self.closed_generation.fill(0)
+            self.generation = 1
+        self.search_count += 1
+        return self.generation
+
+
+class SearchBudget:
+    """Work allowed to the searches of an agent during a tick, as a number of
+    expanded positions and a wall-clock duration in seconds (negative or None
+    for no limit). The searches stop once the budget is exhausted.
+
+    The budget is renewed by `start` at the beginning of each tick, and `stop`
+    counts the ticks whose deadline has been missed.
+    """
+    def __init__(self, max_expansions: int=-1, max_duration: Optional[float]=None) -> None:
+        self.max_expansions = max_expansions
+        self.max_duration = max_duration
+        self.remaining_expansions = max_expansions
+        self.deadline: Optional[float] = None
+        self.exhausted = False
+        self.missed_deadlines = 0
+
+    def start(self) -> None:
+        self.remaining_expansions = self.max_expansions
+        if self.max_duration is None:
+            self.deadline = None
+        else:
+            self.deadline = perf_counter() + self.max_duration
+        self.exhausted = False
+
+    def stop(self) -> None:
+        if self.exhausted:
+            self.missed_deadlines += 1
+
+    def is_exhausted(self) -> bool:
+        if not self.exhausted and self.deadline is not None and perf_counter() > self.deadline:
+            self.exhausted = True
+        return self.exhausted
+
+    def hold_back(self, share: float) -> tuple[int, float]:
+        """Holds back a share of the remaining expansions and time, which the
+        searches can not use until `give_back` is called with the returned
+        amounts.
+        """
+        held_expansions = 0
+        if self.max_expansions >= 0:
+            held_expansions = int(share * self.remaining_expansions)
+            self.remaining_expansions -= held_expansions
+        held_duration = 0.
+        if self.deadline is not None:
+            held_duration = max(share * (self.deadline - perf_counter()), 0.)
+            self.deadline -= held_duration
+        return held_expansions, held_duration
+
+    def give_back(self, held: tuple[int, float]) -> None:
+        """Makes the share held back by `hold_back` available again."""
+        held_expansions, held_duration = held
+        self.remaining_expansions += held_expansions
+        if self.deadline is not None:
+            self.deadline += held_duration
+        if held_expansions > 0 or held_duration > 0:
+            # the searches may only have exhausted the budget without the held
+            # back share, is_exhausted checks the deadline again
+            self.exhausted = False
+
+    def can_afford(self, expansion_count: int) -> bool:
+        """Returns True if a computation visiting `expansion_count` positions,
+        which can not be interrupted, fits in the budget. It never fits when the
+        budget has a deadline, whose remaining time can not be split.
+        """
+        if self.deadline is not None or self.is_exhausted():
+            return False
+        return self.max_expansions < 0 or self.remaining_expansions >= expansion_count
+
+    def get_expansion_limit(self, max_iteraton: int) -> int:
+        """Returns the number of positions a search limited to `max_iteraton`
+        expansions (or not limited if negative) may expand.
+        """
+        if self.max_expansions < 0:
+            return max_iteraton
+        if max_iteraton < 0:
+            return self.remaining_expansions
+        return min(max_iteraton, self.remaining_expansions)
+
+    def consume(self, expansion_count: int, interrupted: bool) -> None:
+        """Charges the budget for a search, `interrupted` telling if the search
+        has been stopped by the budget.
+        """
+        if self.max_expansions >= 0:
+            self.remaining_expansions = max(self.remaining_expansions - expansion_count, 0)
+        if interrupted:
+            self.exhausted = True
+
+
+class NearestDestinationHeuristic:
+    """Heuristic estimating the cost to reach the nearest of several
+    destinations, each one being estimated by its own heuristic.
+    """
+    def __init__(self, heuristics: Sequence[AbstractHeuristic]) -> None:
+        self.heuristics = heuristics
+
+    def __call__(self, x: int, y: int) -> int:
+        return min(h(x, y) for h in self.heuristics)
+
+
+def _get_workspace(graph: AbstractGridGraph, workspace: Optional[SearchWorkspace]) -> SearchWorkspace:
+    if workspace is None:
+        return SearchWorkspace(graph.get_width(), graph.get_height())
+    assert workspace.width == graph.get_width() and workspace.height == graph.get_height()
+    return workspace
 
 
 def _get_path(graph: AbstractGridGraph, src: Position, dst: Position, parents: np.ndarray) -> Path:
@@ -21,7 +169,7 @@ def _get_path(graph: AbstractGridGraph, src: Position, dst: Position, parents: n
     path_dir = []
     x, y = x_dst, y_dst
     while x != x_src or y != y_src:
-        direction = parents[x, y]
+        direction = code_direction(parents[x, y])
         path_x.append(x)
         path_y.append(y)
         path_dir.append(direction)
@@ -29,26 +177,20 @@ def _get_path(graph: AbstractGridGraph, src: Position, dst: Position, parents: n
     return path_x, path_y, path_dir
 
 
-def _minimizing_cost_position(
-    positions: set[Position],
-    dist_from_src: np.ndarray,
-    heuristic: AbstractHeuristic
+def _pop_minimizing_cost_position(
+    opened_positions: list[tuple[int, int, Position]],
+    closed_generation: np.ndarray,
+    generation: int
 ) -> Position:
-    x_min, y_min = NO_PATH_FOUND
-    h_min = np.inf
-    c_min = np.inf
-    for x, y in positions:
-        d = dist_from_src[x, y]
-        h = heuristic(x, y)
-        c = d + h
-        if c < c_min:
-            x_min, y_min = x, y
-            c_min = c
-            h_min = h
-        elif c == c_min and h < h_min:
-            x_min, y_min = x, y
-            h_min = h
-    return x_min, y_min
+    """Pops from the heap of opened positions the one which minimizes the
+    estimated cost, and then the heuristic. Entries of already closed positions
+    are outdated and skipped.
+    """
+    while len(opened_positions) > 0:
+        _, _, position = heappop(opened_positions)
+        if closed_generation[position] != generation:
+            return position
+    return NO_PATH_FOUND
 
 
 def shortest_path(
@@ -56,37 +198,178 @@ def shortest_path(
     src: Position,
     dst: Position,
     heuristic: AbstractHeuristic,
-    max_iteraton: int=-1
+    max_iteraton: int=-1,
+    workspace: Optional[SearchWorkspace]=None
 ) -> Path:
-    parents = np.empty((graph.get_width(), graph.get_height(), 2), dtype=np.int32)
-    dist_from_src = np.full((graph.get_width(), graph.get_height()), np.inf, dtype=np.float64)
+    workspace = _get_workspace(graph, workspace)
+    generation = workspace.new_search()
+    opened_generation = workspace.opened_generation
+    closed_generation = workspace.closed_generation
+    dist_from_src = workspace.dist_from_src
+    parents = workspace.parents
 
     current = src
-    dist_from_src[src] = 0.
+    dist_from_src[src] = 0
+    opened_generation[src] = generation
 
-    opened_positions = {src}
-    closed_positions = set()
+    opened_positions: list[tuple[int, int, Position]] = []
 
     iteration_count = 0
     while current != dst and iteration_count != max_iteraton:
+        closed_generation[current] = generation
+
+        current_path_length = int(dist_from_src[current]) + 1
         for neighbor, direction in graph.iter_free_neighbors(current):
-            if neighbor in closed_positions:
+            if closed_generation[neighbor] == generation:
                 continue
 
-            d = dist_from_src[current]
-            current_path_length = d + 1.
-            if current_path_length < dist_from_src[neighbor]:
+            if opened_generation[neighbor] != generation or current_path_length < dist_from_src[neighbor]:
+                opened_generation[neighbor] = generation
                 dist_from_src[neighbor] = current_path_length
-                parents[neighbor] = direction
-                opened_positions.add(neighbor)
-
-        opened_positions.remove(current)
-        closed_positions.add(current)
+                parents[neighbor] = direction_code(direction)
+                h = heuristic(*neighbor)
+                heappush(opened_positions, (current_path_length + h, h, neighbor))
 
-        next_position = _minimizing_cost_position(opened_positions, dist_from_src, heuristic)
+        next_position = _pop_minimizing_cost_position(opened_positions, closed_generation, generation)
+        iteration_count += 1
         if next_position == NO_PATH_FOUND:
             break
         current = next_position
-        iteration_count += 1
 
+    workspace.expansion_count += iteration_count
     return _get_path(graph, src, current, parents)
+
+
+def _torus_distance_to_nearest(
+    graph: AbstractGridGraph,
+    position: Position,
+    destinations: Sequence[Position]
+) -> int:
+    """Returns a lower bound of the path length between `position` and the
+    nearest destination, regardless of the obstacles.
+    """
+    w, h = graph.get_width(), graph.get_height()
+    x, y = position
+    d_min = w + h
+    for x_dst, y_dst in destinations:
+        dx, dy = abs(x_dst - x), abs(y_dst - y)
+        d = min(dx, w - dx) + min(dy, h - dy)
+        if d < d_min:
+            d_min = d
+    return d_min
+
+
+def shortest_path_to_any(
+    graph: AbstractGridGraph,
+    src: Position,
+    destinations: Sequence[Position],
+    heuristic: AbstractHeuristic,
+    inf_len: int=0,
+    sup_len: int|float=np.inf,
+    max_iteraton: int=-1,
+    workspace: Optional[SearchWorkspace]=None,
+    budget: Optional[SearchBudget]=None,
+    partial: bool=False
+) -> tuple[Optional[int], Optional[Path]]:
+    """Searches in a single pass a path from `src` to one of the destinations,
+    whose length is strictly between `inf_len` and `sup_len`. The search stops
+    at the first destination reached inside this window and returns its index
+    with the path. If no such destination is reached, returns (None, None).
+    When `sup_len` is finite, the positions which can not lead to a destination
+    in less than `sup_len` steps are not explored.
+
+    The destinations are checked when they are popped, so the path found is
+    the shortest one, to the nearest destination, only if `heuristic` never
+    overestimates the distance to the nearest destination. The heuristics
+    which ignore the wrapping of the torus, or square the distances, do not
+    guarantee it.
+
+    The search is also stopped by its budget if one is given. In this case, if
+    `partial` is True and the search made some progress, it returns
+    `PARTIAL_PATH` with the path to the opened position of smallest heuristic.
+    """
+    bounded = sup_len != np.inf
+    budget_limit = -1
+    deadline = None
+    if budget is not None:
+        if budget.is_exhausted():
+            return NO_PATH_FOUND
+        budget_limit = budget.get_expansion_limit(max_iteraton)
+        if budget_limit != max_iteraton:
+            max_iteraton = budget_limit
+        else:
+            budget_limit = -1
+        deadline = budget.deadline
+    destination_indices: dict[Position, int] = {}
+    for i, dst in enumerate(destinations):
+        destination_indices.setdefault(dst, i)
+
+    workspace = _get_workspace(graph, workspace)
+    generation = workspace.new_search()
+    opened_generation = workspace.opened_generation
+    closed_generation = workspace.closed_generation
+    dist_from_src = workspace.dist_from_src
+    parents = workspace.parents
+
+    current = src
+    dist_from_src[src] = 0
+    opened_generation[src] = generation
+
+    opened_positions: list[tuple[int, int, Position]] = []
+    best_h = heuristic(*src)
+    best_position = src
+
+    # number of positions expanded, a destination being reached when it is
+    # popped, before being expanded
+    iteration_count = 0
+    interrupted = False
+    while True:
+        current_path_length = int(dist_from_src[current])
+        if current in destination_indices and inf_len < current_path_length < sup_len:
+            workspace.expansion_count += iteration_count
+            if budget is not None:
+                budget.consume(iteration_count, False)
+            return destination_indices[current], _get_path(graph, src, current, parents)
+
+        if iteration_count == max_iteraton:
+            interrupted = iteration_count == budget_limit
+            break
+        if (
+            deadline is not None and iteration_count % DEADLINE_CHECK_PERIOD == DEADLINE_CHECK_PERIOD - 1
+            and perf_counter() > deadline
+        ):
+            interrupted = True
+            break
+        closed_generation[current] = generation
+
+        current_path_length += 1
+        if current_path_length < sup_len:
+            for neighbor, direction in graph.iter_free_neighbors(current):
+                if closed_generation[neighbor] == generation:
+                    continue
+                if bounded:
+                    lower_bound = current_path_length + _torus_distance_to_nearest(graph, neighbor, destinations)
+                    if lower_bound >= sup_len:
+                        continue
+
+                if opened_generation[neighbor] != generation or current_path_length < dist_from_src[neighbor]:
+                    opened_generation[neighbor] = generation
+                    dist_from_src[neighbor] = current_path_length
+                    parents[neighbor] = direction_code(direction)
+                    h = heuristic(*neighbor)
+                    heappush(opened_positions, (current_path_length + h, h, neighbor))
+                    if h < best_h:
+                        best_h, best_position = h, neighbor
+
+        next_position = _pop_minimizing_cost_position(opened_positions, closed_generation, generation)
+        iteration_count += 1
+        if next_position == NO_PATH_FOUND:
+            break
+        current = next_position
+
+    workspace.expansion_count += iteration_count
+    if budget is not None:
+        budget.consume(iteration_count, interrupted)
+    if interrupted and partial and best_position != src:
+        return PARTIAL_PATH, _get_path(graph, src, best_position, parents)
+    return NO_PATH_FOUND
@@ -4,16 +4,25 @@ from abc import ABC, abstractmethod
 from collections import deque
 from typing import TYPE_CHECKING
 
-from back.a_star import shortest_path
-from back.direction import opposite_dir
+from back.a_star import (PARTIAL_PATH, NearestDestinationHeuristic,
+                         SearchBudget, shortest_path_to_any)
+from back.d_star_lite import IncrementalPlanner
+from back.direction import code_direction, opposite_dir
+from back.distance_field import UNREACHABLE
 
 if TYPE_CHECKING:
     from typing import Iterable, Iterator, Optional, Sequence, Type
 
+    import numpy as np
     from back.type_hints import Direction, Position
     from back.world import AbstractHeuristic, SnakeWorld
 
 
+# share of its search budget an offensive agent keeps for the path to a food,
+# which it searches when it finds no attack
+FOOD_SEARCH_BUDGET_SHARE = 0.25
+
+
 class AbstractSnakeAgent(ABC):
     def __init__(self, world: SnakeWorld, initial_pos: Sequence[Position]) -> None:
         assert len(initial_pos) > 0
@@ -24,6 +33,39 @@ class AbstractSnakeAgent(ABC):
         self.pos = deque(initial_pos)
         self.last_tail_pos = None
 
+        # the cells of the snake are numbered in the order they have been added
+        # at the head, the cell `pos[i]` having the number `tail_number + i`,
+        # and the numbers of the cells on each position are kept in order
+        self.tail_number = 0
+        self.cell_numbers: dict[Position, deque[int]] = {}
+        self._index_cells()
+
+    def _index_cells(self) -> None:
+        self.tail_number = 0
+        self.cell_numbers.clear()
+        for i, p in enumerate(self.pos):
+            numbers = self.cell_numbers.get(p)
+            if numbers is None:
+                self.cell_numbers[p] = deque((i,))
+            else:
+                numbers.append(i)
+
+    def _push_head_number(self, p: Position) -> None:
+        number = self.tail_number + len(self.pos) - 1
+        numbers = self.cell_numbers.get(p)
+        if numbers is None:
+            self.cell_numbers[p] = deque((number,))
+        else:
+            numbers.append(number)
+
+    def _pop_tail_number(self, p: Position) -> None:
+        numbers = self.cell_numbers[p]
+        if len(numbers) == 1:
+            del self.cell_numbers[p]
+        else:
+            numbers.popleft()
+        self.tail_number += 1
+
     def get_id(self) -> int:
         return self.agent_id
 
@@ -58,31 +100,43 @@ class AbstractSnakeAgent(ABC):
             self.pos.extendleft(self.initial_pos)
         else:
             self.pos.extendleft(pos)
+        self._index_cells()
 
     def move(self, d: Direction) -> None:
         """Moves once the snake in the direction `d`."""
         new_head = self.world.get_neighbor(self.pos[-1], d)
-        self.world.add_obstacle(new_head)
+        self.world.add_snake_cell(new_head)
         self.pos.append(new_head)
+        self._push_head_number(new_head)
         self.last_tail_pos = self.pos.popleft()
-        self.world.pop_obstacle(self.last_tail_pos)
+        self.world.pop_snake_cell(self.last_tail_pos)
+        self._pop_tail_number(self.last_tail_pos)
 
     def check_self_collision(self) -> int:
         """Returns the length which should be cutted from the snake's tail if it
         collides with its head. Else, returns 0.
         """
-        return (self.pos.index(self.pos[-1]) + 1) % len(self.pos)
+        first_head_number = self.cell_numbers[self.pos[-1]][0]
+        return (first_head_number - self.tail_number + 1) % len(self.pos)
 
     def cut(self, cut_length: int) -> None:
         """Removes the `cut_length` last cells from the snake."""
         for _ in range(cut_length):
-            self.world.pop_obstacle(self.pos.popleft())
+            tail = self.pos.popleft()
+            self.world.pop_snake_cell(tail)
+            self._pop_tail_number(tail)
 
     def grow(self) -> bool:
         """Adds a cell at the end of the snake's tail."""
         if self.last_tail_pos is not None:
             self.pos.appendleft(self.last_tail_pos)
-            self.world.add_obstacle(self.last_tail_pos)
+            self.world.add_snake_cell(self.last_tail_pos)
+            self.tail_number -= 1
+            numbers = self.cell_numbers.get(self.last_tail_pos)
+            if numbers is None:
+                self.cell_numbers[self.last_tail_pos] = deque((self.tail_number,))
+            else:
+                numbers.appendleft(self.tail_number)
             self.last_tail_pos = None
             return True
         return False
@@ -91,16 +145,14 @@ class AbstractSnakeAgent(ABC):
         """Returns True if the snake collides another snake of the world, False
         otherwise.
         """
-        for other in self.world.iter_alive_agents():
-            if self is not other and self.pos[-1] in other.pos:
-                return True
-        return False
+        head = self.pos[-1]
+        return self.world.get_snake_cell_count(head) > len(self.cell_numbers[head])
 
     def die(self) -> None:
         """Kills the snake."""
         self.alive = False
         for p in self.pos:
-            self.world.pop_obstacle(p)
+            self.world.pop_snake_cell(p)
 
     def is_alive(self) -> bool:
         """Returns True if the snake is alive, False otherwise."""
@@ -172,6 +224,10 @@ class AbstractAISnakeAgent(AbstractSnakeAgent):
         self.latency = latency
         self.cooldown = 0
 
+        # by default, the searches of a tick may expand as many positions as
+        # there are cells in the world
+        self.search_budget = SearchBudget(world.get_width() * world.get_height())
+
     def reset(self, pos: Optional[Sequence[Position]]=None, d: Optional[Direction]=None) -> None:
         super().reset(pos)
         self.x_path.clear()
@@ -189,9 +245,21 @@ class AbstractAISnakeAgent(AbstractSnakeAgent):
         self.y_path.clear()
         self.dir_path.clear()
 
+    def set_search_budget(self, budget: SearchBudget) -> None:
+        """Sets the work allowed to the path searches of the agent per tick."""
+        self.search_budget = budget
+
+    def get_missed_deadlines(self) -> int:
+        """Returns the number of ticks during which the searches of the agent
+        have been stopped by its budget.
+        """
+        return self.search_budget.missed_deadlines
+
     def decide_direction(self) -> None:
         if self.cooldown == 0 or len(self.dir_path) == 0:
+            self.search_budget.start()
             self.update_path()
+            self.search_budget.stop()
             self.cooldown = self.latency
         else:
             self.cooldown -= 1
@@ -212,34 +280,42 @@ class AbstractAISnakeAgent(AbstractSnakeAgent):
         self,
         destinations: Iterable[Position],
         inf_len: int,
-        sup_len: int|float = float('inf')
+        sup_len: int|float = float('inf'),
+        partial: bool=False
     ) -> Optional[int]:
         """Tries to computes the shortest path from the snake's head to one of
         the destination positions, and whose length is strictly between inf_len
         and sup_len. If success, returns the index of the selected destination,
         else returns None.
+        If `partial` is True and the search budget is exhausted before reaching
+        a destination, the path heading to the nearest one is kept and
+        `PARTIAL_PATH` is returned.
         """
         inf_len = max(inf_len, 0)
 
-        head = self.get_head()
-        destination_idx = None
-        current_min = float('inf')
-        path_len = 0
-
+        free_destinations: list[Position] = []
+        free_indices: list[int] = []
         for i, dst in enumerate(destinations):
             if self.world.pos_is_free(dst):
-                heuristic = self.heuristic_type(self.get_world(), dst[0], dst[1])
-                x_path, y_path, dir_path = shortest_path(self.world, head, dst, heuristic, max_iteraton=450)
-                path_len = len(dir_path)
-
-                if inf_len < path_len < min(current_min, sup_len) and x_path[0] == dst[0] and y_path[0] == dst[1]:
-                    destination_idx = i
-                    current_min = path_len
-                    self.x_path = x_path
-                    self.y_path = y_path
-                    self.dir_path = dir_path
-
-        return destination_idx
+                free_destinations.append(dst)
+                free_indices.append(i)
+        if len(free_destinations) == 0:
+            return None
+
+        heuristic = NearestDestinationHeuristic([
+            self.heuristic_type(self.world, x_dst, y_dst) for x_dst, y_dst in free_destinations
+        ])
+        i, path = shortest_path_to_any(
+            self.world, self.get_head(), free_destinations, heuristic, inf_len, sup_len,
+            workspace=self.world.get_search_workspace(), budget=self.search_budget, partial=partial
+        )
+        if i is None:
+            return None
+
+        self.x_path, self.y_path, self.dir_path = path
+        if i == PARTIAL_PATH:
+            return PARTIAL_PATH
+        return free_indices[i]
 
     @abstractmethod
     def update_path(self) -> None:
@@ -247,7 +323,18 @@ class AbstractAISnakeAgent(AbstractSnakeAgent):
 
 
 class AStarSnakeAgent(AbstractAISnakeAgent):
-    """Implement a snake agent which always tries to grow."""
+    """Implement a snake agent which always tries to grow.
+
+    If `view_radius` is not None, the agent only considers the snakes and the
+    foods within this distance of its head, so that its decisions do not cost
+    more as the world holds more snakes. It heads to the foods outside its view
+    only when there is none in it.
+
+    If `use_food_field` is True and the agent sees the whole world, its paths to
+    the nearest food which avoid no danger zone are read from the food field the
+    world shares between its agents instead of being searched, when the field
+    has already been computed during the tick or fits in the search budget.
+    """
     def __init__(
         self,
         world: SnakeWorld,
@@ -255,11 +342,97 @@ class AStarSnakeAgent(AbstractAISnakeAgent):
         initial_dir: Direction,
         heuristic_type: Type[AbstractHeuristic],
         latency: int=0,
-        caution: int=0
+        caution: int=0,
+        incremental: bool=False,
+        reuse_path: bool=False,
+        view_radius: Optional[int]=None,
+        use_food_field: bool=False
     ) -> None:
         assert caution >= 0
+        assert view_radius is None or view_radius >= 0
         super().__init__(world, initial_pos, initial_dir, heuristic_type, latency)
         self.caution_radius = caution
+        self.view_radius = view_radius
+        self.use_food_field = use_food_field and view_radius is None
+
+        # when the path to a food is reused between the ticks, the foods which
+        # existed when it was planned are remembered to detect the new ones
+        self.reuse_path = reuse_path
+        self.food_target: Optional[Position] = None
+        self.known_foods: frozenset[Position] = frozenset()
+        self.path_cache_hits = 0
+        self.path_cache_misses = 0
+
+        # in incremental mode, the paths to the nearest food are planned by
+        # planners which keep their state between the ticks, one for the paths
+        # avoiding the danger zones and one for the others
+        self.incremental = incremental
+        if incremental:
+            self.cautious_planner = IncrementalPlanner(world)
+            self.direct_planner = IncrementalPlanner(world)
+
+    def reset(self, pos: Optional[Sequence[Position]]=None, d: Optional[Direction]=None) -> None:
+        super().reset(pos, d)
+        self.food_target = None
+
+    def die(self) -> None:
+        super().die()
+        self.food_target = None
+
+    def get_path_cache_stats(self) -> tuple[int, int]:
+        """Returns the number of times the path to a food has been reused and the
+        number of times it had to be planned again.
+        """
+        return self.path_cache_hits, self.path_cache_misses
+
+    def food_path_is_reusable(self) -> bool:
+        """Returns True if the path to a food planned during a previous tick can
+        still be followed: it is not blocked, its food has not been eaten and no
+        new food may be closer than its end.
+        """
+        if self.food_target is None or len(self.dir_path) == 0:
+            return False
+        if not self.world.pos_has_food(self.food_target):
+            return False
+        if self.world.obstacle_count[self.x_path, self.y_path].any():
+            return False
+
+        head = self.get_head()
+        path_len = len(self.dir_path)
+        if self.view_radius is None:
+            foods = self.world.iter_food()
+        else:
+            foods = self.world.iter_food_near(head, path_len - 1)
+        for food in foods:
+            if food not in self.known_foods and self.world.get_distance(head, food) < path_len:
+                return False
+        return True
+
+    def iter_dangerous_agents(self) -> Iterator[AbstractSnakeAgent]:
+        """Iterates over the other alive agents whose danger zones are avoided,
+        which are those in view.
+        """
+        if self.view_radius is None:
+            agents = self.world.iter_alive_agents()
+        else:
+            agents = self.world.iter_agents_near(self.get_head(), self.view_radius)
+        return (a for a in agents if a is not self)
+
+    def list_target_foods(self) -> list[Position]:
+        """Returns the foods the agent may head to: those in view, or if there is
+        none in view, the nearest ones found by doubling the view radius.
+        """
+        if self.view_radius is None:
+            return list(self.world.iter_food())
+        head = self.get_head()
+        radius = max(self.view_radius, 1)
+        max_radius = self.world.get_width() + self.world.get_height()
+        while radius < max_radius:
+            foods = list(self.world.iter_food_near(head, radius))
+            if len(foods) > 0:
+                return foods
+            radius *= 2
+        return list(self.world.iter_food())
 
     def start_avoid(self, dangerous_agents: Iterable[AbstractSnakeAgent]) -> list[list[Position]]:
         """Add virtual obstacles in the world to avoid positions that are to close
@@ -284,15 +457,81 @@ class AStarSnakeAgent(AbstractAISnakeAgent):
             for position in layer:
                 self.world.pop_obstacle(position)
 
-    def compute_path_to_nearest_food(self) -> bool:
-        """Tries to compute the shortest path to the nearest food.
+    def follow_food_field(self, food_field: tuple[np.ndarray, np.ndarray]) -> bool:
+        """Reads the shortest path to the nearest food from the food field of
+        the world, by descending it from the free neighbor of the head which is
+        the closest to a food. Returns True if a food can be reached, False
+        otherwise.
+        """
+        dist_field, dir_field = food_field
+        start: Optional[tuple[Position, Direction]] = None
+        start_dist = UNREACHABLE
+        for neighbor, d in self.world.iter_free_neighbors(self.get_head()):
+            dist = int(dist_field[neighbor])
+            if dist != UNREACHABLE and (start is None or dist < start_dist):
+                start, start_dist = (neighbor, d), dist
+        if start is None:
+            return False
+
+        # the path is built from the head, then reversed to end with the food
+        p, d = start
+        x_path, y_path, dir_path = [p[0]], [p[1]], [d]
+        for _ in range(start_dist):
+            d = code_direction(int(dir_field[p]))
+            p = self.world.get_neighbor(p, d)
+            x_path.append(p[0])
+            y_path.append(p[1])
+            dir_path.append(d)
+        x_path.reverse()
+        y_path.reverse()
+        dir_path.reverse()
+        self.x_path, self.y_path, self.dir_path = x_path, y_path, dir_path
+        return True
+
+    def compute_path_to_nearest_food(self, cautious: bool=False) -> bool:
+        """Tries to compute the shortest path to the nearest food. `cautious`
+        tells if the danger zones are currently avoided.
         Returns True if success, False otherwise.
         """
-        return self.compute_shortest_path(self.world.iter_food(), 0, float('inf')) is not None
+        self.food_target = None
+        food_field = None
+        if self.use_food_field and (not cautious or self.caution_radius == 0):
+            # no virtual obstacle of the agent is in the world
+            food_field = self.world.get_food_field(self.search_budget)
+        if food_field is not None:
+            if not self.follow_food_field(food_field):
+                return False
+        elif self.incremental:
+            planner = self.cautious_planner if cautious else self.direct_planner
+            path = planner.plan(self.get_head(), (f for f in self.list_target_foods() if self.world.pos_is_free(f)))
+            if path is None:
+                return False
+            self.x_path, self.y_path, self.dir_path = path
+        else:
+            i = self.compute_shortest_path(self.list_target_foods(), 0, float('inf'), partial=True)
+            if i is None:
+                return False
+            if i == PARTIAL_PATH:
+                # the path stops on the way, it is planned again at the next tick
+                return True
+
+        self.food_target = (self.x_path[0], self.y_path[0])
+        if self.view_radius is None:
+            self.known_foods = frozenset(self.world.iter_food())
+        else:
+            # only the foods closer than the end of the path matter to reuse it
+            self.known_foods = frozenset(self.world.iter_food_near(self.get_head(), len(self.dir_path)))
+        return True
 
     def update_path(self) -> None:
-        danger_zone = self.start_avoid(a for a in self.world.iter_alive_agents() if self is not a)
-        success = self.compute_path_to_nearest_food()
+        danger_zone = self.start_avoid(self.iter_dangerous_agents())
+        if self.reuse_path and self.food_path_is_reusable():
+            self.stop_avoid(danger_zone)
+            self.path_cache_hits += 1
+            return
+        if self.reuse_path:
+            self.path_cache_misses += 1
+        success = self.compute_path_to_nearest_food(cautious=True)
         self.stop_avoid(danger_zone)
 
         if not success:
@@ -308,9 +547,16 @@ class AStarOffensiveSnakeAgent(AStarSnakeAgent):
         heuristic_type: Type[AbstractHeuristic],
         latency: int=0,
         caution: int=0,
-        attack_anticipation: int=15
+        attack_anticipation: int=15,
+        incremental: bool=False,
+        reuse_path: bool=False,
+        view_radius: Optional[int]=None,
+        use_food_field: bool=False
     ) -> None:
-        super().__init__(world, initial_pos, initial_dir, heuristic_type, latency, caution)
+        super().__init__(
+            world, initial_pos, initial_dir, heuristic_type, latency, caution, incremental, reuse_path,
+            view_radius, use_food_field
+        )
         self.attack_anticipation = attack_anticipation
         self.target: Optional[AbstractSnakeAgent] = None
         self.opponents: list[AbstractSnakeAgent] = []
@@ -318,6 +564,18 @@ class AStarOffensiveSnakeAgent(AStarSnakeAgent):
     def add_opponent(self, opponent: AbstractAISnakeAgent) -> None:
         self.opponents.append(opponent)
 
+    def list_potential_targets(self) -> list[AbstractSnakeAgent]:
+        """Returns the agents the agent may attack: its alive opponents, or
+        with a view radius, every other snake in view which is close enough to
+        be intercepted.
+        """
+        if self.view_radius is None:
+            return [a for a in self.opponents if a.is_alive()]
+        # the impact position is at most `attack_anticipation` moves away from
+        # both heads
+        radius = min(self.view_radius, 2 * self.attack_anticipation)
+        return [a for a in self.world.iter_agents_near(self.get_head(), radius) if a is not self]
+
     def reset(self, pos: Optional[Sequence[Position]]=None, d: Optional[Direction]=None) -> None:
         super().reset(pos, d)
         self.target = None
@@ -341,21 +599,23 @@ class AStarOffensiveSnakeAgent(AStarSnakeAgent):
             potential_targets = new_potential_targets
             impact_positions = new_impact_positions
 
-
-            for agent in potential_targets:
-                i = self.compute_shortest_path(impact_positions, impact_delay - len(self), impact_delay)
-                if i is not None:
-                    self.target = potential_targets[i]
-                    return True
+            i = self.compute_shortest_path(impact_positions, impact_delay - len(self), impact_delay)
+            if i is not None:
+                self.target = potential_targets[i]
+                return True
 
         self.target = None
         return False
 
     def update_path(self) -> None:
+        held = self.search_budget.hold_back(FOOD_SEARCH_BUDGET_SHARE)
         if self.target is not None and self.target.is_alive():
             success = self.compute_attack_path((self.target,))
         else:
-            success = self.compute_attack_path([a for a in self.opponents if a.is_alive()])
+            success = self.compute_attack_path(self.list_potential_targets())
+        self.search_budget.give_back(held)
 
-        if not success:
+        if success:
+            self.food_target = None
+        else:
             super().update_path()
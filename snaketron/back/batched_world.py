@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+from collections import deque
+from random import Random
+from typing import TYPE_CHECKING
+
+import numpy as np
+from back.direction import DIRECTIONS
+from back.free_cells import FreeCellIndex
+from back.world import find_spawn_pos
+
+if TYPE_CHECKING:
+    from typing import Optional, Sequence
+
+    from back.type_hints import Position
+
+
+# displacement of each direction code, the code 0 does not move
+DIRECTION_DELTAS = np.array(((0, 0),) + DIRECTIONS, dtype=np.int64)
+
+
+class BatchedSnakeWorld:
+    """Holds a batch of independent snake games, played by the same snakes on
+    grids of the same size, in stacked arrays so that all the games can be
+    simulated together.
+
+    Each step follows the rules of `SnakeWorld.simulate`, and consumes the
+    random generator of each game in the same order, but the directions of the
+    snakes are given by the caller instead of being decided by agents. Snakes
+    are indexed by their agent id.
+    """
+    def __init__(
+        self,
+        n_games: int,
+        width: int,
+        height: int,
+        n_food: int,
+        initial_positions: Sequence[Sequence[Position]],
+        respawn_cooldown: Optional[int]=None,
+        seeds: Optional[Sequence[int]]=None
+    ) -> None:
+        assert n_games > 0 and width > 0 and height > 0
+        assert n_food >= 0
+        assert respawn_cooldown is None or respawn_cooldown >= 0
+        assert all(len(pos) > 0 for pos in initial_positions)
+        assert seeds is None or len(seeds) == n_games
+
+        self.n_games = n_games
+        self.n_agents = len(initial_positions)
+        self.width = width
+        self.height = height
+        self.initial_n_food = n_food
+        self.initial_positions = [list(pos) for pos in initial_positions]
+        if respawn_cooldown is None:
+            self.initial_respawn_cooldown = float('+inf')
+        else:
+            self.initial_respawn_cooldown = respawn_cooldown
+
+        if seeds is None:
+            self.rngs = [Random() for _ in range(n_games)]
+        else:
+            self.rngs = [Random(seed) for seed in seeds]
+
+        k, n = n_games, self.n_agents
+        self.obstacle_count = np.zeros((k, width, height), dtype=np.uint8)
+        self.occupancy = np.zeros((k, n, width, height), dtype=np.uint16)
+        self.food = np.zeros((k, width, height), dtype=np.bool_)
+        self.food_count = np.zeros(k, dtype=np.int64)
+        self.free_cells = [FreeCellIndex(width, height) for _ in range(n_games)]
+        self.respawn_cooldown = np.full(k, self.initial_respawn_cooldown, dtype=np.float64)
+
+        # the body of each snake is stored in a ring buffer, from the tail to the
+        # head, starting at the slot `tail % capacity`
+        self.capacity = 2 * max(len(pos) for pos in initial_positions)
+        self.body = np.zeros((k, n, self.capacity, 2), dtype=np.int64)
+        self.tail = np.zeros((k, n), dtype=np.int64)
+        self.length = np.zeros((k, n), dtype=np.int64)
+        self.last_tail = np.zeros((k, n, 2), dtype=np.int64)
+
+        # the order in which the snakes have been added to the alive agents of
+        # each game, and the queue of the dead ones
+        self.alive = np.ones((k, n), dtype=np.bool_)
+        self.alive_rank = np.tile(np.arange(n, dtype=np.int64), (k, 1))
+        self.next_rank = np.full(k, n, dtype=np.int64)
+        self.dead_agents: list[deque[int]] = [deque() for _ in range(n_games)]
+        self.dead_count = np.zeros(k, dtype=np.int64)
+
+    # ---- private
+    def _expand_capacity(self, min_capacity: int) -> None:
+        """Reallocates the ring buffers so that they can contain `min_capacity`
+        cells, and moves the tail of each snake to the first slot.
+        """
+        capacity = self.capacity
+        while capacity < min_capacity:
+            capacity *= 2
+        slots = (self.tail[:, :, None] + np.arange(self.capacity)) % self.capacity
+        ordered = np.take_along_axis(self.body, slots[:, :, :, None], axis=2)
+        self.body = np.zeros((self.n_games, self.n_agents, capacity, 2), dtype=np.int64)
+        self.body[:, :, :self.capacity] = ordered
+        self.tail[:] = 0
+        self.capacity = capacity
+
+    def _ordered_cells(self, k: int, a: int) -> np.ndarray:
+        """Returns the cells of a snake from the tail to the head."""
+        slots = (self.tail[k, a] + np.arange(self.length[k, a])) % self.capacity
+        return self.body[k, a, slots]
+
+    def _place_agent(self, k: int, a: int, cells: Sequence[Position]) -> None:
+        """Puts an agent of a game on the given cells, given from head to tail."""
+        length = len(cells)
+        if length > self.capacity:
+            self._expand_capacity(length)
+        self.tail[k, a] = 0
+        self.length[k, a] = length
+        self.body[k, a, :length] = cells[::-1]
+        for x, y in cells:
+            self.obstacle_count[k, x, y] += 1
+            self.occupancy[k, a, x, y] += 1
+
+    def _iter_alive_agents(self, k: int) -> list[int]:
+        alive_agents = np.flatnonzero(self.alive[k])
+        return alive_agents[np.argsort(self.alive_rank[k, alive_agents])].tolist()
+
+    def _spawn_missing_food(self, k: int) -> None:
+        # the free-cell index of the game is brought up to date with the cells
+        # which changed, in flat order, like `SnakeWorld._update_free_cells`
+        free_cells = self.free_cells[k]
+        free_mask = ((self.obstacle_count[k] == 0) & ~self.food[k]).ravel()
+        free_cells.update(np.flatnonzero(free_mask != (free_cells.slots >= 0)).tolist(), free_mask)
+
+        for _ in range(self.initial_n_food - self.food_count[k]):
+            if len(free_cells) == 0:
+                break
+            cell = free_cells.draw(self.rngs[k])
+            free_cells.discard(cell)
+            self.food[k].flat[cell] = True
+            self.food_count[k] += 1
+
+    def _respawn_dead_agent(self, k: int) -> None:
+        """Respawns the first dead snake of a game whose respawn cooldown is over."""
+        snake_mask = self.occupancy[k].any(axis=0)
+        spawn_pos = find_spawn_pos(self.obstacle_count[k], snake_mask, int(self.alive[k].sum()))
+        if spawn_pos is None:
+            return
+
+        a = self.dead_agents[k].popleft()
+        self.dead_count[k] -= 1
+        self._place_agent(k, a, [spawn_pos] * len(self.initial_positions[a]))
+        self.alive[k, a] = True
+        self.alive_rank[k, a] = self.next_rank[k]
+        self.next_rank[k] += 1
+        self.respawn_cooldown[k] += self.initial_respawn_cooldown
+
+    # ---- public
+    def get_heads(self) -> np.ndarray:
+        """Returns the head position of each snake of each game, in an array of
+        shape (n_games, n_agents, 2). The heads of the dead snakes are where
+        they died.
+        """
+        slots = (self.tail + self.length - 1) % self.capacity
+        return np.take_along_axis(self.body, slots[:, :, None, None], axis=2)[:, :, 0]
+
+    def get_agent_cells(self, k: int, a: int) -> list[Position]:
+        """Returns the cells of a snake of the game `k` from the tail to the head."""
+        return list(map(tuple, self._ordered_cells(k, a).tolist()))
+
+    def iter_food(self, k: int) -> list[Position]:
+        """Returns the food positions of the game `k`."""
+        return list(map(tuple, np.argwhere(self.food[k]).tolist()))
+
+    def reset(self, games: Optional[Sequence[int]]=None) -> None:
+        """Resets the given games, or all of them, to make them ready to start
+        a new game.
+        """
+        if games is None:
+            games = range(self.n_games)
+
+        for k in games:
+            self.obstacle_count[k] = 0
+            self.occupancy[k] = 0
+            self.food[k] = False
+            self.food_count[k] = 0
+            self.free_cells[k].rebuild(np.ones(self.width * self.height, dtype=np.bool_))
+            self._spawn_missing_food(k)
+
+            self.respawn_cooldown[k] = self.initial_respawn_cooldown
+            order = self._iter_alive_agents(k) + list(self.dead_agents[k])
+            self.dead_agents[k].clear()
+            self.dead_count[k] = 0
+            for rank, a in enumerate(order):
+                self._place_agent(k, a, self.initial_positions[a])
+                self.alive[k, a] = True
+                self.alive_rank[k, a] = rank
+            self.next_rank[k] = len(order)
+
+    def simulate(self, directions: np.ndarray) -> np.ndarray:
+        """Simulates one step of every game, the snakes moving in the given
+        directions, an array of shape (n_games, n_agents) of direction codes
+        (see `back.direction.direction_code`) ignored for the dead snakes.
+        Returns the boolean mask of the snakes which died during this step.
+        """
+        kk, aa = np.nonzero(self.alive)
+        codes = directions[kk, aa]
+        assert np.all((codes > 0) & (codes <= len(DIRECTIONS)))
+
+        # moves the snakes
+        heads = self.get_heads()[kk, aa]
+        new_heads = (heads + DIRECTION_DELTAS[codes]) % (self.width, self.height)
+        hx, hy = new_heads[:, 0], new_heads[:, 1]
+        tail_slots = self.tail[kk, aa] % self.capacity
+        old_tails = self.body[kk, aa, tail_slots]
+        tx, ty = old_tails[:, 0], old_tails[:, 1]
+
+        self.body[kk, aa, (self.tail[kk, aa] + self.length[kk, aa]) % self.capacity] = new_heads
+        self.tail[kk, aa] += 1
+        self.last_tail[kk, aa] = old_tails
+        np.add.at(self.obstacle_count, (kk, hx, hy), 1)
+        np.subtract.at(self.obstacle_count, (kk, tx, ty), 1)
+        self.occupancy[kk, aa, hx, hy] += 1
+        self.occupancy[kk, aa, tx, ty] -= 1
+
+        # resolves the snakes which eat their own tail
+        cut_lengths: list[tuple[int, int, int]] = []
+        for i in np.flatnonzero(self.occupancy[kk, aa, hx, hy] > 1).tolist():
+            k, a = kk[i], aa[i]
+            cells = self._ordered_cells(k, a)
+            first_idx = np.flatnonzero(np.all(cells == new_heads[i], axis=1))[0]
+            cut_len = (first_idx + 1) % len(cells)
+            if cut_len > 0:
+                cut_lengths.append((k, a, cut_len))
+        for k, a, cut_len in cut_lengths:
+            for x, y in self._ordered_cells(k, a)[:cut_len].tolist():
+                self.obstacle_count[k, x, y] -= 1
+                self.occupancy[k, a, x, y] -= 1
+            self.tail[k, a] += cut_len
+            self.length[k, a] -= cut_len
+
+        # resolves the snakes which eat food and grow
+        cell_ids = (kk * self.width + hx) * self.height + hy
+        _, inverse, counts = np.unique(cell_ids, return_inverse=True, return_counts=True)
+        growing = self.food[kk, hx, hy] & (counts[inverse] == 1)
+        gk, ga = kk[growing], aa[growing]
+        self.food[gk, hx[growing], hy[growing]] = False
+        np.subtract.at(self.food_count, gk, 1)
+        if len(gk) > 0 and self.length[gk, ga].max() + 1 > self.capacity:
+            self._expand_capacity(self.length[gk, ga].max() + 1)
+        grown_tails = self.last_tail[gk, ga]
+        self.tail[gk, ga] -= 1
+        self.length[gk, ga] += 1
+        self.body[gk, ga, self.tail[gk, ga] % self.capacity] = grown_tails
+        np.add.at(self.obstacle_count, (gk, grown_tails[:, 0], grown_tails[:, 1]), 1)
+        self.occupancy[gk, ga, grown_tails[:, 0], grown_tails[:, 1]] += 1
+
+        # kills each snake which collides another snake
+        colliding = self.obstacle_count[kk, hx, hy] > self.occupancy[kk, aa, hx, hy]
+        deads = np.zeros((self.n_games, self.n_agents), dtype=np.bool_)
+        deads[kk[colliding], aa[colliding]] = True
+        for k in np.unique(kk[colliding]).tolist():
+            game_deads = [a for a in self._iter_alive_agents(k) if deads[k, a]]
+            for a in game_deads:
+                self.obstacle_count[k] -= self.occupancy[k, a].astype(np.uint8)
+                self.occupancy[k, a] = 0
+                self.alive[k, a] = False
+            self.rngs[k].shuffle(game_deads)
+            self.dead_agents[k].extend(game_deads)
+            self.dead_count[k] += len(game_deads)
+
+        # respawns the foods which has been eaten
+        for k in np.flatnonzero(self.food_count < self.initial_n_food).tolist():
+            self._spawn_missing_food(k)
+
+        # respawns dead snakes
+        waiting = np.flatnonzero(self.dead_count > 0)
+        cooling = self.respawn_cooldown[waiting] > 0
+        self.respawn_cooldown[waiting[cooling]] -= 1
+        for k in waiting[~cooling].tolist():
+            self._respawn_dead_agent(k)
+
+        return deads
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+from heapq import heappop, heappush
+from typing import TYPE_CHECKING
+
+import numpy as np
+from back.direction import DIRECTIONS
+
+if TYPE_CHECKING:
+    from typing import Iterable, Optional
+
+    from back.type_hints import Path, Position
+    from back.world import SnakeWorld
+    Key = tuple[float, float]
+
+
+INF = float('inf')
+
+
+class IncrementalPlanner:
+    """Plans the shortest paths from a moving start position to the nearest of a
+    set of goal positions with D* Lite.
+
+    The search is made backward, from the goals, and its state is kept between
+    two plans. Before each plan, only the vertices around the cells whose
+    obstacle state changed since the previous plan are repaired, so that the
+    returned path is the same as the one of a fresh search. The state is
+    rebuilt from scratch when the set of goals changes.
+    """
+    def __init__(self, world: SnakeWorld) -> None:
+        self.world = world
+        self.width = world.get_width()
+        self.height = world.get_height()
+
+        self.goals: frozenset[Position] = frozenset()
+        self.blocked = np.zeros((self.width, self.height), dtype=np.bool_)
+        self.start: Optional[Position] = None
+        self.last_start: Optional[Position] = None
+        self.key_modifier = 0
+
+        self.g: dict[Position, float] = {}
+        self.rhs: dict[Position, float] = {}
+        self.opened_keys: dict[Position, Key] = {}
+        self.opened_positions: list[tuple[Key, Position]] = []
+
+    # ---- private
+    def _heuristic(self, p: Position) -> int:
+        dx, dy = abs(p[0] - self.start[0]), abs(p[1] - self.start[1])
+        return min(dx, self.width - dx) + min(dy, self.height - dy)
+
+    def _key(self, p: Position) -> Key:
+        v = min(self.g.get(p, INF), self.rhs.get(p, INF))
+        return (v + self._heuristic(p) + self.key_modifier, v)
+
+    def _iter_neighbors(self, p: Position) -> Iterable[Position]:
+        x, y = p
+        return (((x + dx) % self.width, (y + dy) % self.height) for dx, dy in DIRECTIONS)
+
+    def _open(self, p: Position) -> None:
+        key = self._key(p)
+        self.opened_keys[p] = key
+        heappush(self.opened_positions, (key, p))
+
+    def _top(self) -> tuple[Key, Optional[Position]]:
+        """Returns the smallest key of the opened positions with its position,
+        and drops the outdated heap entries.
+        """
+        while len(self.opened_positions) > 0:
+            key, p = self.opened_positions[0]
+            if self.opened_keys.get(p) == key:
+                return key, p
+            heappop(self.opened_positions)
+        return (INF, INF), None
+
+    def _update_vertex(self, p: Position) -> None:
+        if p not in self.goals:
+            rhs = INF
+            for neighbor in self._iter_neighbors(p):
+                if not self.blocked[neighbor]:
+                    rhs = min(rhs, self.g.get(neighbor, INF) + 1)
+            self.rhs[p] = rhs
+        self.opened_keys.pop(p, None)
+        if self.g.get(p, INF) != self.rhs.get(p, INF):
+            self._open(p)
+
+    def _compute_shortest_path(self) -> int:
+        """Expands the inconsistent vertices until the start is consistent, and
+        returns the number of expansions.
+        """
+        expansion_count = 0
+        while True:
+            top_key, p = self._top()
+            start_g, start_rhs = self.g.get(self.start, INF), self.rhs.get(self.start, INF)
+            if p is None or (top_key >= self._key(self.start) and start_g == start_rhs):
+                return expansion_count
+
+            new_key = self._key(p)
+            if top_key < new_key:
+                self._open(p)
+            elif self.g.get(p, INF) > self.rhs.get(p, INF):
+                expansion_count += 1
+                heappop(self.opened_positions)
+                del self.opened_keys[p]
+                self.g[p] = self.rhs[p]
+                for neighbor in self._iter_neighbors(p):
+                    self._update_vertex(neighbor)
+            else:
+                expansion_count += 1
+                heappop(self.opened_positions)
+                del self.opened_keys[p]
+                self.g[p] = INF
+                self._update_vertex(p)
+                for neighbor in self._iter_neighbors(p):
+                    self._update_vertex(neighbor)
+
+    def _reset(self, goals: frozenset[Position], blocked: np.ndarray) -> None:
+        self.goals = goals
+        self.blocked = blocked
+        self.last_start = self.start
+        self.key_modifier = 0
+        self.g.clear()
+        self.rhs.clear()
+        self.opened_keys.clear()
+        self.opened_positions.clear()
+        for goal in goals:
+            self.rhs[goal] = 0
+            self._open(goal)
+
+    def _repair(self, blocked: np.ndarray) -> None:
+        self.key_modifier += self._heuristic(self.last_start)
+        self.last_start = self.start
+
+        changed_cells = np.argwhere(blocked != self.blocked)
+        self.blocked = blocked
+        for x, y in changed_cells.tolist():
+            for neighbor in self._iter_neighbors((x, y)):
+                self._update_vertex(neighbor)
+
+    def _extract_path(self) -> Optional[Path]:
+        path_length = self.g.get(self.start, INF)
+        if path_length == INF:
+            return None
+
+        x_path: list[int] = []
+        y_path: list[int] = []
+        dir_path = []
+        current = self.start
+        for _ in range(int(path_length)):
+            best_cost, best_neighbor, best_dir = INF, None, None
+            for d in DIRECTIONS:
+                neighbor = self.world.get_neighbor(current, d)
+                if not self.blocked[neighbor]:
+                    cost = self.g.get(neighbor, INF) + 1
+                    if cost < best_cost:
+                        best_cost, best_neighbor, best_dir = cost, neighbor, d
+            if best_neighbor is None:
+                return None
+            current = best_neighbor
+            x_path.append(current[0])
+            y_path.append(current[1])
+            dir_path.append(best_dir)
+        if current not in self.goals:
+            return None
+
+        x_path.reverse()
+        y_path.reverse()
+        dir_path.reverse()
+        return x_path, y_path, dir_path
+
+    # ---- public
+    def plan(self, start: Position, goals: Iterable[Position]) -> Optional[Path]:
+        """Returns the shortest path from `start` to the nearest goal, in the
+        same format as `back.a_star.shortest_path`, or None if no goal can be
+        reached.
+        """
+        goals = frozenset(goals)
+        if len(goals) == 0:
+            return None
+
+        blocked = self.world.obstacle_count != 0
+        self.start = start
+        if goals != self.goals or self.last_start is None:
+            self._reset(goals, blocked)
+        else:
+            self._repair(blocked)
+
+        # the plans are counted with the searches of the world
+        workspace = self.world.get_search_workspace()
+        workspace.search_count += 1
+        workspace.expansion_count += self._compute_shortest_path()
+        return self._extract_path()
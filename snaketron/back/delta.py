@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from itertools import islice
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Iterator
+
+    from back.agent import AbstractSnakeAgent
+    from back.type_hints import Position
+
+
+class WorldDelta:
+    """Changes of a `SnakeWorld` accumulated over the ticks simulated since the
+    delta has been cleared: the snake cells occupied and freed by each agent,
+    the foods spawned and eaten, the deaths and the respawns.
+
+    The changes are netted, so that a cell freed then occupied again by the
+    same agent, or a food spawned then eaten, does not appear. After a reset
+    of the world, only `reset` is meaningful, and the consumers should read
+    the whole state of the world again.
+
+    The delta is attached to a world with `SnakeWorld.set_delta`, and only
+    costs a test per phase when the world has none.
+    """
+    def __init__(self) -> None:
+        self.reset = False
+        self.tick_count = 0
+        # net change of the number of cells of each agent on each position
+        self.cell_changes: defaultdict[int, Counter[Position]] = defaultdict(Counter)
+        # net change of the number of foods on each position
+        self.food_changes: Counter[Position] = Counter()
+        # id of each agent which died, with its cells at its death, in order
+        self.deaths: list[tuple[int, list[Position]]] = []
+        self.respawns: list[int] = []
+        # agents whose length may have changed
+        self.resized: set[int] = set()
+
+    # ---- recording
+    def record_reset(self) -> None:
+        self.clear()
+        self.reset = True
+
+    def add_cell(self, agent_id: int, p: Position) -> None:
+        self.cell_changes[agent_id][p] += 1
+
+    def pop_cell(self, agent_id: int, p: Position) -> None:
+        self.cell_changes[agent_id][p] -= 1
+
+    def add_food(self, p: Position) -> None:
+        self.food_changes[p] += 1
+
+    def pop_food(self, p: Position) -> None:
+        self.food_changes[p] -= 1
+
+    def record_move(self, agent: AbstractSnakeAgent) -> None:
+        """Records the last move of an agent, which has not grown since."""
+        agent_id = agent.get_id()
+        self.add_cell(agent_id, agent.get_head())
+        self.pop_cell(agent_id, agent.last_tail_pos)
+
+    def record_cut(self, agent: AbstractSnakeAgent, cut_length: int) -> None:
+        """Records the cut of the `cut_length` last cells of an agent, before
+        they are removed.
+        """
+        agent_id = agent.get_id()
+        self.resized.add(agent_id)
+        for p in islice(agent.pos, cut_length):
+            self.pop_cell(agent_id, p)
+
+    def record_growth(self, agent: AbstractSnakeAgent) -> None:
+        """Records the growth of an agent, after its tail has been extended."""
+        agent_id = agent.get_id()
+        self.resized.add(agent_id)
+        self.add_cell(agent_id, agent.pos[0])
+
+    def record_death(self, agent: AbstractSnakeAgent) -> None:
+        """Records the death of an agent, which frees all its cells."""
+        agent_id = agent.get_id()
+        cells = list(agent.iter_cells())
+        self.deaths.append((agent_id, cells))
+        for p in cells:
+            self.pop_cell(agent_id, p)
+
+    def record_respawn(self, agent: AbstractSnakeAgent) -> None:
+        """Records the respawn of an agent, and the cells it occupies."""
+        agent_id = agent.get_id()
+        self.respawns.append(agent_id)
+        self.resized.add(agent_id)
+        for p in agent.iter_cells():
+            self.add_cell(agent_id, p)
+
+    def end_tick(self) -> None:
+        self.tick_count += 1
+
+    def clear(self) -> None:
+        """Forgets the changes recorded so far."""
+        self.reset = False
+        self.tick_count = 0
+        self.cell_changes.clear()
+        self.food_changes.clear()
+        self.deaths.clear()
+        self.respawns.clear()
+        self.resized.clear()
+
+    # ---- queries
+    def iter_cell_changes(self) -> Iterator[tuple[int, Position, int]]:
+        """Iterates over the non-zero changes of the number of cells of an agent
+        on a position, as (agent id, position, change) tuples.
+        """
+        for agent_id, changes in self.cell_changes.items():
+            for p, change in changes.items():
+                if change != 0:
+                    yield agent_id, p, change
+
+    def iter_spawned_food(self) -> Iterator[Position]:
+        """Iterates over the positions which have gained a food."""
+        return (p for p, change in self.food_changes.items() if change > 0)
+
+    def iter_eaten_food(self) -> Iterator[Position]:
+        """Iterates over the positions which have lost their food."""
+        return (p for p, change in self.food_changes.items() if change < 0)
@@ -44,3 +44,19 @@ def away_from_center(x: Real, y: Real, width: Real, height: Real) -> Direction:
 
 def opposite_dir(d: Direction) -> Direction:
     return (-d[0], -d[1])
+
+
+NO_DIRECTION_CODE = 0
+DIRECTIONS: tuple[Direction, ...] = (UP, DOWN, LEFT, RIGHT)
+
+
+def direction_code(d: Direction) -> int:
+    """Returns the integer code of the direction `d`, suitable for compact storage
+    in integer arrays. Code 0 means no direction.
+    """
+    return DIRECTIONS.index(d) + 1
+
+
+def code_direction(code: int) -> Direction:
+    """Returns the direction encoded by a non-zero integer code."""
+    return DIRECTIONS[code - 1]
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+from back.direction import DIRECTIONS, direction_code, opposite_dir
+
+if TYPE_CHECKING:
+    from typing import Iterable
+
+    from back.type_hints import Direction, Position
+
+
+UNREACHABLE = -1
+
+
+def _source_mask(shape: tuple[int, int], sources: Iterable[Position]) -> np.ndarray:
+    mask = np.zeros(shape, dtype=np.bool_)
+    for x, y in sources:
+        mask[x, y] = True
+    return mask
+
+
+def _shift(grid: np.ndarray, d: Direction, out: np.ndarray) -> None:
+    """Writes into `out` the grid moved by one step in the direction `d` on the
+    torus, as `np.roll` would without allocating.
+    """
+    dx, dy = d
+    if dy == 0:
+        grid, out, step = grid, out, dx
+    else:
+        # the second axis is handled as the first one of the transposed grid
+        grid, out, step = grid.T, out.T, dy
+    if step > 0:
+        out[1:] = grid[:-1]
+        out[0] = grid[-1]
+    else:
+        out[:-1] = grid[1:]
+        out[-1] = grid[0]
+
+
+def wavefront(
+    free: np.ndarray,
+    sources: Iterable[Position],
+    max_distance: int=-1,
+    with_directions: bool=False
+) -> tuple[np.ndarray, np.ndarray|None]:
+    """Propagates a breadth first search wavefront on the torus from all the
+    sources at once, through the cells for which `free` is True. The sources
+    themselves do not need to be free.
+
+    Returns the distance field, which gives for each cell the length of the
+    shortest path between the cell and its nearest source (UNREACHABLE if none
+    is reachable), and if `with_directions` is True, the direction field, which
+    gives for each cell the code of the direction to follow to get one step
+    closer to its nearest source (0 for the sources and the unreached cells).
+    """
+    frontier = _source_mask(free.shape, sources)
+    unreached = free & ~frontier
+
+    dist_field = np.full(free.shape, UNREACHABLE, dtype=np.int32)
+    dist_field[frontier] = 0
+    dir_field = np.zeros(free.shape, dtype=np.uint8) if with_directions else None
+    codes_toward_source = [direction_code(opposite_dir(d)) for d in DIRECTIONS]
+
+    # the masks of each step are written into buffers allocated once
+    expansion = np.empty_like(frontier)
+    new_cells = np.empty_like(frontier)
+    distance = 0
+    while distance != max_distance and frontier.any():
+        distance += 1
+        expansion.fill(False)
+        for d, code in zip(DIRECTIONS, codes_toward_source):
+            _shift(frontier, d, out=new_cells)
+            new_cells &= unreached
+            # removes the new cells from the unreached ones
+            np.greater(unreached, new_cells, out=unreached)
+            expansion |= new_cells
+            if dir_field is not None:
+                dir_field[new_cells] = code
+        dist_field[expansion] = distance
+        frontier, expansion = expansion, frontier
+
+    return dist_field, dir_field
+
+
+def torus_manhattan_distance(sources: np.ndarray) -> np.ndarray:
+    """Returns the Manhattan distance on the torus between each cell and the
+    nearest cell for which `sources` is True, ignoring the obstacles. There
+    must be at least one source.
+
+    The transform is separable, and along each axis the distances are
+    propagated by shifts of 1, 2, 4... cells in both directions, so it costs
+    O(log(width) + log(height)) vectorized operations on the grid.
+    """
+    assert sources.any()
+    width, height = sources.shape
+    dist_field = np.where(sources, 0, width + height).astype(np.int32)
+    shifted = np.empty_like(dist_field)
+    # the second axis is handled as the first one of the transposed grid
+    for grid, buffer in ((dist_field, shifted), (dist_field.T, shifted.T)):
+        length = grid.shape[0]
+        shift = 1
+        while shift <= length // 2:
+            for _ in range(2):
+                np.add(grid[:-shift], shift, out=buffer[shift:])
+                np.add(grid[-shift:], shift, out=buffer[:shift])
+                np.minimum(grid, buffer, out=grid)
+                # the second time, shifts in the opposite direction
+                grid, buffer = grid[::-1], buffer[::-1]
+            shift *= 2
+    return dist_field
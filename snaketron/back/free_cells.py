@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from random import Random
+    from typing import Iterable
+
+
+class FreeCellIndex:
+    """Set of the free cells of a grid, identified by their flat index
+    `x * height + y`, supporting constant time insertions, removals and uniform
+    draws.
+
+    The cells are stored in an array whose first `len(self)` slots are used,
+    a removed cell being replaced by the last one, and a position map gives
+    the slot of each cell, or -1 if it is not in the set. The order of the
+    array only depends on the sequence of operations.
+    """
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.cells = np.empty(width * height, dtype=np.int64)
+        self.slots = np.full(width * height, -1, dtype=np.int64)
+        self.n_cells = 0
+
+    def __len__(self) -> int:
+        return self.n_cells
+
+    def __contains__(self, cell: int) -> bool:
+        return self.slots[cell] >= 0
+
+    def rebuild(self, free_mask: np.ndarray) -> None:
+        """Replaces the content of the set by the free cells of a boolean grid,
+        in flat order.
+        """
+        free_cells = np.flatnonzero(free_mask)
+        self.n_cells = len(free_cells)
+        self.cells[:self.n_cells] = free_cells
+        self.slots.fill(-1)
+        self.slots[free_cells] = np.arange(self.n_cells)
+
+    def add(self, cell: int) -> None:
+        if self.slots[cell] < 0:
+            self.cells[self.n_cells] = cell
+            self.slots[cell] = self.n_cells
+            self.n_cells += 1
+
+    def discard(self, cell: int) -> None:
+        slot = self.slots[cell]
+        if slot >= 0:
+            self.n_cells -= 1
+            last_cell = self.cells[self.n_cells]
+            self.cells[slot] = last_cell
+            self.slots[last_cell] = slot
+            self.slots[cell] = -1
+
+    def update(self, cells: Iterable[int], free_mask: np.ndarray) -> None:
+        """Adds or removes each of the given cells, in the given order,
+        according to the flattened boolean grid `free_mask`.
+        """
+        for cell in cells:
+            if free_mask[cell]:
+                self.add(cell)
+            else:
+                self.discard(cell)
+
+    def draw(self, rng: Random) -> int:
+        """Returns a cell of the set drawn uniformly, which must not be empty."""
+        return int(self.cells[rng.randrange(self.n_cells)])
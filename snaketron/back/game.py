@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+from itertools import chain
+from math import ceil, sqrt
+from typing import TYPE_CHECKING
+
+from back.a_star import SearchBudget
+from back.agent import AStarOffensiveSnakeAgent, PlayerSnakeAgent
+from back.direction import DOWN
+from back.world import (EuclidianDistanceHeuristic,
+                        EuclidianDistancePeriodicHeuristic,
+                        ManhattanDistanceHeuristic, SnakeWorld)
+
+if TYPE_CHECKING:
+    from typing import Optional, Sequence
+
+    from back.agent import AbstractAISnakeAgent
+    from back.type_hints import Direction, Position
+
+
+MASSIVE_INITIAL_LENGTH = 4
+MASSIVE_VIEW_RADIUS = 16
+
+
+def define_opponents(
+    player_agents: list[PlayerSnakeAgent],
+    ai_agents: list[AStarOffensiveSnakeAgent]
+) -> None:
+    if len(player_agents) >= 1:
+        for ai in ai_agents:
+            for player in player_agents:
+                ai.add_opponent(player)
+
+    else:
+        half = len(ai_agents) // 2
+        for agent in ai_agents[half:]:
+            for opponent in ai_agents[:half]:
+                agent.add_opponent(opponent)
+
+
+def starting_positions(height: int, width: int) -> list[tuple[list[Position], Direction]]:
+    """Returns the initial positions and directions of the four snakes of a game."""
+    dx = int(0.2 * width)
+    dy = 1
+    init_length = int(0.36 * height)
+
+    x_left = dx
+    x_right = width - dx - 1
+
+    blue_init_pos = [(x_left, y) for y in range(init_length-1+dy, -1+dy, -1)]
+    yellow_init_pos = [(x_right, y) for y in range(init_length-1+dy, -1+dy, -1)]
+    purple_init_pos = [(x_left, y) for y in range(height-1-dy, height-1-init_length-dy, -1)]
+    green_init_pos = [(x_right, y) for y in range(height-1-dy, height-1-init_length-dy, -1)]
+
+    return [
+        (blue_init_pos, DOWN),
+        (yellow_init_pos, DOWN),
+        (purple_init_pos, DOWN),
+        (green_init_pos, DOWN)
+    ]
+
+
+def lattice_starting_positions(
+    height: int,
+    width: int,
+    n_snakes: int,
+    init_length: int
+) -> list[tuple[list[Position], Direction]]:
+    """Returns the initial positions and directions of `n_snakes` snakes spread
+    over the grid, each one in its own cell of a lattice.
+    """
+    if n_snakes == 0:
+        return []
+    n_columns = ceil(sqrt(n_snakes * width / height))
+    n_rows = ceil(n_snakes / n_columns)
+    dx, dy = width // n_columns, height // n_rows
+    # a free row above and below each snake
+    length = min(init_length, dy - 2)
+    if dx < 1 or length < 1:
+        raise ValueError("Too many snakes for the size of the grid")
+
+    positions = []
+    for i in range(n_snakes):
+        row, column = divmod(i, n_columns)
+        x = column * dx + dx // 2
+        y_tail = row * dy + 1
+        positions.append(([(x, y) for y in range(y_tail + length - 1, y_tail - 1, -1)], DOWN))
+    return positions
+
+
+def build_game(
+    height: int,
+    width: int,
+    n_food: int,
+    n_snakes: int,
+    n_players: int,
+    respawn_cooldown: Optional[int],
+    seed: Optional[int]=None,
+    node_budget: Optional[int]=None,
+    time_budget: Optional[float]=None
+) -> tuple[SnakeWorld, Sequence[PlayerSnakeAgent], Sequence[AbstractAISnakeAgent]]:
+    """Builds the world of a game with its player and AI agents. The searches
+    of each AI agent may expand `node_budget` positions and last `time_budget`
+    seconds per tick, the default budget of the agents being kept if both are
+    None.
+    """
+    if not (0 <= n_snakes <= 4):
+        raise ValueError("Too many snakes, see build_massive_game")
+    if not (0 <= n_players <= n_snakes):
+        raise ValueError("Too many players")
+
+    (
+        (blue_init_pos, blue_init_dir),
+        (yellow_init_pos, yellow_init_dir),
+        (purple_init_pos, purple_init_dir),
+        (green_init_pos, green_init_dir)
+    ) = starting_positions(height, width)
+
+    attack_anticipation = int(0.15*(height + width))
+
+    world = SnakeWorld(width, height, n_food, respawn_cooldown, seed)
+    player_agents: list[PlayerSnakeAgent] = []
+    ai_agents: list[AStarOffensiveSnakeAgent] = []
+
+    if n_players >= 1:
+        player_agents.append(PlayerSnakeAgent(world, blue_init_pos, blue_init_dir))
+    elif n_snakes >= 1:
+        ai_agents.append(AStarOffensiveSnakeAgent(
+            world, blue_init_pos, blue_init_dir,
+            # EuclidianDistancePeriodicHeuristic,
+            EuclidianDistanceHeuristic,
+            latency=0, caution=1, attack_anticipation=attack_anticipation, reuse_path=True
+        ))
+
+    if n_players >= 2:
+        player_agents.append(PlayerSnakeAgent(world, yellow_init_pos, yellow_init_dir))
+    elif n_snakes >= 2:
+        ai_agents.append(AStarOffensiveSnakeAgent(
+            world, yellow_init_pos, yellow_init_dir,
+            # EuclidianDistancePeriodicHeuristic,
+            EuclidianDistanceHeuristic,
+            latency=0, caution=1, attack_anticipation=attack_anticipation, reuse_path=True
+        ))
+
+    if n_players >= 3:
+        player_agents.append(PlayerSnakeAgent(world, purple_init_pos, purple_init_dir))
+    elif n_snakes >= 3:
+        ai_agents.append(AStarOffensiveSnakeAgent(
+            world, purple_init_pos, purple_init_dir,
+            EuclidianDistanceHeuristic,
+            latency=0, caution=1, attack_anticipation=attack_anticipation, reuse_path=True
+        ))
+
+    if n_players >= 4:
+        player_agents.append(PlayerSnakeAgent(world, green_init_pos, green_init_dir))
+    elif n_snakes >= 4:
+        ai_agents.append(AStarOffensiveSnakeAgent(
+            world, green_init_pos, green_init_dir,
+            ManhattanDistanceHeuristic,
+            latency=0, caution=3, attack_anticipation=attack_anticipation, reuse_path=True
+        ))
+
+    define_opponents(player_agents, ai_agents)
+
+    if node_budget is not None or time_budget is not None:
+        for agent in ai_agents:
+            agent.set_search_budget(SearchBudget(-1 if node_budget is None else node_budget, time_budget))
+
+    for agent in chain(player_agents, ai_agents):
+        world.attach_agent(agent)
+
+    return world, player_agents, ai_agents
+
+
+def build_massive_game(
+    height: int,
+    width: int,
+    n_food: int,
+    n_snakes: int,
+    respawn_cooldown: Optional[int],
+    seed: Optional[int]=None,
+    view_radius: int=MASSIVE_VIEW_RADIUS,
+    node_budget: Optional[int]=None,
+    time_budget: Optional[float]=None
+) -> tuple[SnakeWorld, Sequence[PlayerSnakeAgent], Sequence[AbstractAISnakeAgent]]:
+    """Builds the world of a game between many AI snakes, spread over the grid,
+    each one attacking any snake it sees. The agents only consider what is
+    within `view_radius` of their heads, and their searches may expand
+    `node_budget` positions per tick, by default as many as there are in their
+    view, so that a tick costs about linearly in the number of snakes.
+    """
+    if n_snakes < 0:
+        raise ValueError("Negative number of snakes")
+
+    world = SnakeWorld(width, height, n_food, respawn_cooldown, seed)
+    ai_agents: list[AStarOffensiveSnakeAgent] = []
+    for init_pos, init_dir in lattice_starting_positions(height, width, n_snakes, MASSIVE_INITIAL_LENGTH):
+        ai_agents.append(AStarOffensiveSnakeAgent(
+            world, init_pos, init_dir,
+            ManhattanDistanceHeuristic,
+            latency=0, caution=1, attack_anticipation=view_radius // 2, reuse_path=True,
+            view_radius=view_radius
+        ))
+
+    if node_budget is None:
+        node_budget = (2 * view_radius + 1) ** 2
+    for agent in ai_agents:
+        agent.set_search_budget(SearchBudget(node_budget, time_budget))
+        world.attach_agent(agent)
+
+    return world, [], ai_agents
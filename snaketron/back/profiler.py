@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from time import perf_counter_ns
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Iterator, Optional
+
+    from back.agent import AbstractSnakeAgent
+    from back.world import SnakeWorld
+
+
+# phases of `SnakeWorld.simulate`, in their order
+DECIDE = 'decide'
+MOVE = 'move'
+CUT = 'cut'
+EAT = 'eat'
+KILL = 'kill'
+SPAWN_FOOD = 'spawn_food'
+RESPAWN = 'respawn'
+PHASES = (DECIDE, MOVE, CUT, EAT, KILL, SPAWN_FOOD, RESPAWN)
+
+
+class Histogram:
+    """Histogram of non-negative integers, with a bucket per power of 2: the
+    bucket `i` counts the values `v` such that `2**(i-1) <= v < 2**i`, and the
+    bucket 0 counts the zeros.
+    """
+    def __init__(self) -> None:
+        self.bucket_counts: list[int] = []
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def add(self, value: int) -> None:
+        i = value.bit_length()
+        if i >= len(self.bucket_counts):
+            self.bucket_counts.extend([0] * (i + 1 - len(self.bucket_counts)))
+        self.bucket_counts[i] += 1
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else 0.
+
+    def quantile(self, q: float) -> int:
+        """Returns an upper bound of the `q` quantile of the values, exact to
+        a factor of 2.
+        """
+        assert 0. <= q <= 1.
+        if self.count == 0:
+            return 0
+        rank = q * self.count
+        cumulated_count = 0
+        for i, bucket_count in enumerate(self.bucket_counts):
+            cumulated_count += bucket_count
+            if cumulated_count >= rank and bucket_count > 0:
+                return min((1 << i) - 1, self.max)
+        return self.max
+
+    def iter_buckets(self) -> Iterator[tuple[int, int, int]]:
+        """Iterates over the non-empty buckets as (lower bound, upper bound
+        excluded, count) tuples.
+        """
+        for i, bucket_count in enumerate(self.bucket_counts):
+            if bucket_count > 0:
+                yield (1 << i) >> 1, 1 << i, bucket_count
+
+
+class TickProfiler:
+    """Records the timings of the ticks of a `SnakeWorld`, of their phases and
+    of the decision of each agent, in nanoseconds, with the number of searches
+    and expanded positions counted by the search workspace of the world.
+
+    The profiler is attached to a world with `SnakeWorld.set_profiler`, and
+    only costs a test per phase when the world has none.
+    """
+    def __init__(self) -> None:
+        self.tick_count = 0
+        self.tick_times = Histogram()
+        self.phase_times = {phase: Histogram() for phase in PHASES}
+        self.tick_searches = Histogram()
+        self.tick_expansions = Histogram()
+        self.agent_times: defaultdict[int, Histogram] = defaultdict(Histogram)
+        self.agent_searches: defaultdict[int, Histogram] = defaultdict(Histogram)
+        self.agent_expansions: defaultdict[int, Histogram] = defaultdict(Histogram)
+
+        self.world: Optional[SnakeWorld] = None
+        self.tick_start = 0
+        self.lap_start = 0
+        self.tick_search_count = 0
+        self.tick_expansion_count = 0
+
+    def _search_counts(self) -> tuple[int, int]:
+        workspace = self.world.get_search_workspace()
+        return workspace.search_count, workspace.expansion_count
+
+    # ---- recording
+    def start_tick(self, world: SnakeWorld) -> None:
+        self.world = world
+        self.tick_search_count, self.tick_expansion_count = self._search_counts()
+        self.tick_start = self.lap_start = perf_counter_ns()
+
+    def end_phase(self, phase: str) -> None:
+        """Records the time elapsed since the end of the previous phase."""
+        now = perf_counter_ns()
+        self.phase_times[phase].add(now - self.lap_start)
+        self.lap_start = now
+
+    def end_tick(self) -> None:
+        self.tick_count += 1
+        self.tick_times.add(perf_counter_ns() - self.tick_start)
+        search_count, expansion_count = self._search_counts()
+        self.tick_searches.add(search_count - self.tick_search_count)
+        self.tick_expansions.add(expansion_count - self.tick_expansion_count)
+
+    def decide_direction(self, agent: AbstractSnakeAgent) -> None:
+        """Makes an agent decide its direction, and records what it cost."""
+        search_count, expansion_count = self._search_counts()
+        start = perf_counter_ns()
+        agent.decide_direction()
+        elapsed = perf_counter_ns() - start
+        new_search_count, new_expansion_count = self._search_counts()
+
+        agent_id = agent.get_id()
+        self.agent_times[agent_id].add(elapsed)
+        self.agent_searches[agent_id].add(new_search_count - search_count)
+        self.agent_expansions[agent_id].add(new_expansion_count - expansion_count)
+
+    # ---- queries
+    def get_phase_times(self, phase: str) -> Histogram:
+        """Returns the histogram of the durations of a phase (see `PHASES`)."""
+        return self.phase_times[phase]
+
+    def get_agent_times(self, agent_id: int) -> Histogram:
+        """Returns the histogram of the decision durations of an agent."""
+        return self.agent_times[agent_id]
+
+    def get_agent_searches(self, agent_id: int) -> Histogram:
+        """Returns the histogram of the number of searches per decision of an agent."""
+        return self.agent_searches[agent_id]
+
+    def get_agent_expansions(self, agent_id: int) -> Histogram:
+        """Returns the histogram of the number of expanded positions per decision
+        of an agent.
+        """
+        return self.agent_expansions[agent_id]
+
+    def summary(self) -> str:
+        """Returns a table of the mean and tail durations of the ticks and their
+        phases, and of the decisions of each agent, in microseconds.
+        """
+        lines = [f"{'':>14} {'mean':>9} {'p50':>9} {'p99':>9} {'max':>9} {'share':>7}"]
+        tick_total = max(self.tick_times.total, 1)
+
+        def add_line(name: str, histogram: Histogram) -> None:
+            lines.append(
+                f"{name:>14} {histogram.mean() / 1e3:>9.1f} {histogram.quantile(.5) / 1e3:>9.1f} "
+                f"{histogram.quantile(.99) / 1e3:>9.1f} {histogram.max / 1e3:>9.1f} "
+                f"{histogram.total / tick_total:>7.1%}"
+            )
+
+        add_line('tick', self.tick_times)
+        for phase in PHASES:
+            add_line(phase, self.phase_times[phase])
+        for agent_id in sorted(self.agent_times):
+            add_line(f"agent {agent_id}", self.agent_times[agent_id])
+        lines.append(
+            f"searches/tick: {self.tick_searches.mean():.1f}, "
+            f"expansions/tick: {self.tick_expansions.mean():.1f}"
+        )
+        return '\n'.join(lines)
@@ -0,0 +1,498 @@
+from __future__ import annotations
+
+import mmap
+import struct
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+from back.agent import AbstractSnakeAgent
+from back.direction import NO_DIRECTION_CODE, code_direction, direction_code
+from back.world import SnakeWorld
+
+if TYPE_CHECKING:
+    from typing import Iterator, Optional, Sequence
+
+    from back.type_hints import Direction, Position
+
+
+# A replay file starts with a header describing the world and its agents,
+# followed by a stream of records:
+# - a tick record per simulated step, holding the direction code of each agent
+#   (0 for the dead ones) with the foods and the agents which spawned during
+#   this step,
+# - a keyframe record holding the full state of the world after the reset and
+#   then every `keyframe_interval` ticks.
+# A footer indexing the keyframes ends the file once the recording is closed.
+# All the integers are little endian.
+MAGIC = b'SNKR'
+VERSION = 1
+INDEX_MAGIC = b'SNKI'
+TICK_TAG = ord('T')
+KEYFRAME_TAG = ord('K')
+
+HEADER = struct.Struct('<4sBHHHHId')
+AGENT_HEADER = struct.Struct('<H')
+TICK_HEADER = struct.Struct('<BBB')
+KEYFRAME_HEADER = struct.Struct('<BId')
+COUNT = struct.Struct('<H')
+ALIVE_AGENT = struct.Struct('<HI')
+RESPAWN = struct.Struct('<HHH')
+INDEX_ENTRY = struct.Struct('<QQ')
+TRAILER = struct.Struct('<QQQ4s')
+CELL_DTYPE = np.dtype('<u2')
+
+MAX_COORDINATE = np.iinfo(CELL_DTYPE).max
+
+
+def _pack_cells(cells: Sequence[Position]) -> bytes:
+    return np.array(cells, dtype=CELL_DTYPE).reshape(-1, 2).tobytes()
+
+
+@dataclass(frozen=True)
+class TickRecord:
+    """Logged step of a game, turning the state of the tick `tick - 1` into the
+    state of the tick `tick`.
+    """
+    tick: int
+    directions: bytes
+    food: tuple[Position, ...]
+    respawns: tuple[tuple[int, Position], ...]
+
+
+class ReplayRecorder:
+    """Writes a game of a `SnakeWorld` into a replay file.
+
+    The recorder is attached to the world with `SnakeWorld.set_recorder`, and
+    logs the game starting at the next reset of the world. It must be closed
+    to write the keyframe index, without which the file can still be read,
+    but has to be scanned when opened.
+    """
+    def __init__(self, path: str, keyframe_interval: int=256) -> None:
+        assert keyframe_interval > 0
+        self.file = open(path, 'wb')
+        self.keyframe_interval = keyframe_interval
+        self.n_agents = 0
+        self.tick = -1
+        self.codes = bytearray()
+        self.keyframes: list[tuple[int, int]] = []
+
+    def __enter__(self) -> ReplayRecorder:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # ---- private
+    def _write_header(self, world: SnakeWorld) -> None:
+        if max(world.get_width(), world.get_height()) > MAX_COORDINATE + 1:
+            raise ValueError("The world is too large to be recorded")
+        agents = list(world.iter_agents())
+        self.n_agents = len(agents)
+        self.file.write(HEADER.pack(
+            MAGIC, VERSION,
+            world.get_width(), world.get_height(), world.initial_n_food, self.n_agents,
+            self.keyframe_interval, world.initial_respawn_cooldown
+        ))
+        for agent in agents:
+            self.file.write(AGENT_HEADER.pack(agent.get_initial_length()))
+            self.file.write(_pack_cells(agent.initial_pos))
+
+    def _write_keyframe(self, world: SnakeWorld) -> None:
+        self.keyframes.append((self.tick, self.file.tell()))
+        write = self.file.write
+        write(KEYFRAME_HEADER.pack(KEYFRAME_TAG, self.tick, world.respawn_cooldown))
+
+        food = list(world.iter_food())
+        write(COUNT.pack(len(food)))
+        write(_pack_cells(food))
+
+        alive_agents = list(world.iter_alive_agents())
+        write(COUNT.pack(len(alive_agents)))
+        for agent in alive_agents:
+            write(ALIVE_AGENT.pack(agent.get_id(), len(agent)))
+            write(_pack_cells(list(agent.iter_cells())))
+
+        write(COUNT.pack(len(world.dead_agents)))
+        write(np.array([agent.get_id() for agent in world.dead_agents], dtype=CELL_DTYPE).tobytes())
+
+    # ---- public
+    def record_reset(self, world: SnakeWorld) -> None:
+        """Starts the log of the game with the state of the world after its reset."""
+        if self.tick >= 0:
+            raise RuntimeError("A replay file holds a single game")
+        self._write_header(world)
+        self.tick = 0
+        self._write_keyframe(world)
+
+    def record_directions(self, agents: Sequence[AbstractSnakeAgent], directions: Sequence[Direction]) -> None:
+        """Logs the directions in which the alive agents move during the current step."""
+        self.codes = bytearray(self.n_agents)
+        for agent, d in zip(agents, directions):
+            self.codes[agent.get_id()] = direction_code(d)
+
+    def record_events(
+        self,
+        world: SnakeWorld,
+        spawned_food: Sequence[Position],
+        respawned_agent: Optional[AbstractSnakeAgent]
+    ) -> None:
+        """Ends the log of the current step with the foods and the agent which
+        spawned during this step.
+        """
+        if self.tick < 0:
+            raise RuntimeError("The recording starts at the next reset of the world")
+        self.tick += 1
+        respawns = [] if respawned_agent is None else [respawned_agent]
+
+        write = self.file.write
+        write(TICK_HEADER.pack(TICK_TAG, len(spawned_food), len(respawns)))
+        write(self.codes)
+        write(_pack_cells(spawned_food))
+        for agent in respawns:
+            write(RESPAWN.pack(agent.get_id(), *agent.get_head()))
+
+        if self.tick % self.keyframe_interval == 0:
+            self._write_keyframe(world)
+
+    def close(self) -> None:
+        """Writes the keyframe index and closes the file."""
+        if self.file.closed:
+            return
+        if self.tick >= 0:
+            index_offset = self.file.tell()
+            for tick, offset in self.keyframes:
+                self.file.write(INDEX_ENTRY.pack(tick, offset))
+            self.file.write(TRAILER.pack(self.tick, index_offset, len(self.keyframes), INDEX_MAGIC))
+        self.file.close()
+
+
+class ReplayAgent(AbstractSnakeAgent):
+    """Snake agent moving in the directions read from a replay file."""
+    def __init__(self, world: SnakeWorld, initial_pos: Sequence[Position]) -> None:
+        super().__init__(world, initial_pos)
+        self.dir: Optional[Direction] = None
+
+    def reset(self, pos: Optional[Sequence[Position]]=None, d: Optional[Direction]=None) -> None:
+        super().reset(pos)
+        self.dir = d
+
+    def decide_direction(self) -> None:
+        pass
+
+    def get_direction(self) -> Direction:
+        return self.dir
+
+
+class ReplayWorld(SnakeWorld):
+    """Snake world replaying the steps of a replay file: the foods and the dead
+    agents spawn where they are logged instead of being drawn at random.
+
+    Between two keyframes, the agents which die during the same step are queued
+    in a random order, which does not matter as the respawns are logged.
+    """
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        n_food: int,
+        respawn_cooldown: Optional[int],
+        initial_positions: Sequence[Sequence[Position]]
+    ) -> None:
+        super().__init__(width, height, n_food, respawn_cooldown)
+        self.tick = -1
+        self.agents = [ReplayAgent(self, pos) for pos in initial_positions]
+        for agent in self.agents:
+            self.attach_agent(agent)
+        self.pending_food: Sequence[Position] = ()
+        self.pending_respawns: Sequence[tuple[int, Position]] = ()
+
+    # ---- private
+    def _spawn_missing_food(self) -> list[Position]:
+        self.food_pos.update(self.pending_food)
+        if self.delta is not None:
+            for pos in self.pending_food:
+                self.delta.add_food(pos)
+        return list(self.pending_food)
+
+    def _respawn_dead_agent(self) -> Optional[AbstractSnakeAgent]:
+        if len(self.pending_respawns) == 0:
+            if len(self.dead_agents) > 0 and self.respawn_cooldown > 0:
+                self.respawn_cooldown -= 1
+            return
+
+        for agent_id, spawn_pos in self.pending_respawns:
+            agent = self.agents[agent_id]
+            self.dead_agents.remove(agent)
+            self._spawn_agent(agent, spawn_pos)
+            self.respawn_cooldown += self.initial_respawn_cooldown
+            if self.delta is not None:
+                self.delta.record_respawn(agent)
+        return agent
+
+    # ---- public
+    def load_state(
+        self,
+        tick: int,
+        respawn_cooldown: float,
+        food: Sequence[Position],
+        alive_cells: Sequence[tuple[int, Sequence[Position]]],
+        dead_ids: Sequence[int]
+    ) -> None:
+        """Replaces the state of the world by the one of a keyframe, the cells
+        of each alive agent being given from the head to the tail.
+        """
+        self.tick = tick
+        if respawn_cooldown == float('inf'):
+            self.respawn_cooldown = respawn_cooldown
+        else:
+            self.respawn_cooldown = int(respawn_cooldown)
+        self.obstacle_count.fill(0)
+        self.snake_cell_count.fill(0)
+        self.food_pos = set(food)
+
+        self.alive_agents.clear()
+        for agent_id, cells in alive_cells:
+            agent = self.agents[agent_id]
+            agent.reset(cells)
+            self.alive_agents.append(agent)
+            for pos in cells:
+                self.obstacle_count[pos] += 1
+                self.snake_cell_count[pos] += 1
+
+        self.dead_agents.clear()
+        for agent_id in dead_ids:
+            agent = self.agents[agent_id]
+            agent.alive = False
+            agent.pos.clear()
+            self.dead_agents.append(agent)
+        self.buckets_are_stale = True
+        self.food_field = None
+
+        if self.delta is not None:
+            self.delta.record_reset()
+
+    def apply(self, record: TickRecord) -> list[AbstractSnakeAgent]:
+        """Simulates the logged step following the current state, and returns
+        the agents which died during this step.
+        """
+        assert record.tick == self.tick + 1
+        for agent in self.alive_agents:
+            code = record.directions[agent.get_id()]
+            if code == NO_DIRECTION_CODE:
+                raise ValueError(f"No direction logged for the alive agent {agent.get_id()} at tick {record.tick}")
+            agent.dir = code_direction(code)
+
+        self.pending_food = record.food
+        self.pending_respawns = record.respawns
+        deads = self.simulate()
+        self.tick = record.tick
+        return deads
+
+
+class ReplayReader:
+    """Reads a replay file through a memory map, so that long games can be
+    scanned without being loaded.
+
+    Seeking to a tick loads the last keyframe before it and replays the ticks
+    in between, thus costs at most `keyframe_interval` steps.
+    """
+    def __init__(self, path: str) -> None:
+        self.file = open(path, 'rb')
+        try:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{path} is not a replay file") from None
+
+        try:
+            self._read_header(path)
+            if not self._read_index():
+                self._scan_index()
+
+            self.world = ReplayWorld(
+                self.width, self.height, self.n_food, self.respawn_cooldown, self.initial_positions
+            )
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self) -> ReplayReader:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """Returns the number of logged ticks."""
+        return self.n_ticks
+
+    # ---- private
+    def _read_header(self, path: str) -> None:
+        if len(self.buffer) < HEADER.size:
+            raise ValueError(f"{path} is not a replay file")
+        (
+            magic, version,
+            self.width, self.height, self.n_food, self.n_agents,
+            self.keyframe_interval, respawn_cooldown
+        ) = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a replay file")
+        if version != VERSION:
+            raise ValueError(f"Unsupported replay version: {version}")
+        self.respawn_cooldown = None if respawn_cooldown == float('inf') else int(respawn_cooldown)
+
+        offset = HEADER.size
+        self.initial_positions: list[list[Position]] = []
+        for _ in range(self.n_agents):
+            length, = AGENT_HEADER.unpack_from(self.buffer, offset)
+            cells, offset = self._read_cells(offset + AGENT_HEADER.size, length)
+            self.initial_positions.append(cells)
+        self.data_offset = offset
+
+    def _read_index(self) -> bool:
+        """Reads the keyframe index from the footer, and returns False if there
+        is none.
+        """
+        if len(self.buffer) - self.data_offset < TRAILER.size:
+            return False
+        self.n_ticks, index_offset, n_keyframes, magic = TRAILER.unpack_from(
+            self.buffer, len(self.buffer) - TRAILER.size
+        )
+        if magic != INDEX_MAGIC:
+            return False
+
+        entries = [INDEX_ENTRY.unpack_from(self.buffer, index_offset + i*INDEX_ENTRY.size) for i in range(n_keyframes)]
+        self.keyframe_ticks = [tick for tick, _ in entries]
+        self.keyframe_offsets = [offset for _, offset in entries]
+        self.end_offset = index_offset
+        return True
+
+    def _scan_index(self) -> None:
+        """Rebuilds the keyframe index of a file whose recording has not been
+        closed, ignoring its truncated last record.
+        """
+        self.n_ticks = 0
+        self.keyframe_ticks = []
+        self.keyframe_offsets = []
+        offset = self.data_offset
+        while True:
+            try:
+                if self.buffer[offset] == KEYFRAME_TAG:
+                    next_offset = self._read_keyframe(offset)[-1]
+                    self.keyframe_ticks.append(KEYFRAME_HEADER.unpack_from(self.buffer, offset)[1])
+                    self.keyframe_offsets.append(offset)
+                else:
+                    next_offset = self._read_tick(offset, self.n_ticks + 1)[1]
+                    self.n_ticks += 1
+            except (IndexError, struct.error, ValueError):
+                break
+            offset = next_offset
+        self.end_offset = offset
+        if len(self.keyframe_ticks) == 0:
+            raise ValueError("The replay file does not hold any keyframe")
+
+    def _read_cells(self, offset: int, n_cells: int) -> tuple[list[Position], int]:
+        cells = np.frombuffer(self.buffer, dtype=CELL_DTYPE, count=2*n_cells, offset=offset)
+        return list(map(tuple, cells.reshape(-1, 2).tolist())), offset + cells.nbytes
+
+    def _read_tick(self, offset: int, tick: int) -> tuple[TickRecord, int]:
+        tag, n_food, n_respawns = TICK_HEADER.unpack_from(self.buffer, offset)
+        if tag != TICK_TAG:
+            raise ValueError(f"Corrupted replay record at offset {offset}")
+        offset += TICK_HEADER.size
+        directions = self.buffer[offset:offset + self.n_agents]
+        if len(directions) != self.n_agents:
+            raise IndexError(offset)
+        food, offset = self._read_cells(offset + self.n_agents, n_food)
+        respawns = []
+        for _ in range(n_respawns):
+            agent_id, x, y = RESPAWN.unpack_from(self.buffer, offset)
+            respawns.append((agent_id, (x, y)))
+            offset += RESPAWN.size
+        return TickRecord(tick, directions, tuple(food), tuple(respawns)), offset
+
+    def _read_keyframe(self, offset: int) -> tuple[int, float, list[Position], list, list[int], int]:
+        tag, tick, respawn_cooldown = KEYFRAME_HEADER.unpack_from(self.buffer, offset)
+        if tag != KEYFRAME_TAG:
+            raise ValueError(f"Corrupted replay record at offset {offset}")
+        offset += KEYFRAME_HEADER.size
+
+        n_food, = COUNT.unpack_from(self.buffer, offset)
+        food, offset = self._read_cells(offset + COUNT.size, n_food)
+
+        n_alive, = COUNT.unpack_from(self.buffer, offset)
+        offset += COUNT.size
+        alive_cells = []
+        for _ in range(n_alive):
+            agent_id, length = ALIVE_AGENT.unpack_from(self.buffer, offset)
+            cells, offset = self._read_cells(offset + ALIVE_AGENT.size, length)
+            alive_cells.append((agent_id, cells))
+
+        n_dead, = COUNT.unpack_from(self.buffer, offset)
+        dead_ids = np.frombuffer(self.buffer, dtype=CELL_DTYPE, count=n_dead, offset=offset + COUNT.size)
+        offset += COUNT.size + dead_ids.nbytes
+        return tick, respawn_cooldown, food, alive_cells, dead_ids.tolist(), offset
+
+    def _read_next_tick(self, offset: int, tick: int) -> tuple[TickRecord, int]:
+        """Reads the tick record at `offset`, or after the keyframe at `offset`."""
+        if self.buffer[offset] == KEYFRAME_TAG:
+            offset = self._read_keyframe(offset)[-1]
+        return self._read_tick(offset, tick)
+
+    def _seek(self, tick: int) -> int:
+        """Puts the world in the state of the tick `tick`, and returns the
+        offset of the record which follows this tick.
+        """
+        if not (0 <= tick <= self.n_ticks):
+            raise IndexError(f"Tick {tick} is out of the replay (0 to {self.n_ticks})")
+        i = bisect_right(self.keyframe_ticks, tick) - 1
+        *state, offset = self._read_keyframe(self.keyframe_offsets[i])
+        self.world.load_state(*state)
+        while self.world.tick < tick:
+            record, offset = self._read_next_tick(offset, self.world.tick + 1)
+            self.world.apply(record)
+        return offset
+
+    # ---- public
+    def iter_ticks(self, start: int=1) -> Iterator[TickRecord]:
+        """Iterates over the logged steps from the tick `start`, without
+        simulating them.
+        """
+        assert 1 <= start
+        if start > self.n_ticks:
+            return
+        i = bisect_right(self.keyframe_ticks, start - 1) - 1
+        offset = self._read_keyframe(self.keyframe_offsets[i])[-1]
+        for tick in range(self.keyframe_ticks[i] + 1, self.n_ticks + 1):
+            record, offset = self._read_next_tick(offset, tick)
+            if tick >= start:
+                yield record
+
+    def seek(self, tick: int) -> ReplayWorld:
+        """Returns the world in the state of the tick `tick`, 0 being the state
+        after the reset. The same world is returned by all the calls.
+        """
+        self._seek(tick)
+        return self.world
+
+    def play(self, start: int=0, stop: Optional[int]=None) -> Iterator[ReplayWorld]:
+        """Iterates over the states of the world from the tick `start` until
+        the tick `stop` (excluded), or the end of the replay. The same world is
+        yielded at each tick.
+        """
+        if stop is None or stop > self.n_ticks + 1:
+            stop = self.n_ticks + 1
+        if start >= stop:
+            return
+        offset = self._seek(start)
+        yield self.world
+        for tick in range(start + 1, stop):
+            record, offset = self._read_next_tick(offset, tick)
+            self.world.apply(record)
+            yield self.world
+
+    def close(self) -> None:
+        self.buffer.close()
+        self.file.close()
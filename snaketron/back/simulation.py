@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Optional
+
+    from back.world import SnakeWorld
+
+
+SURVIVOR = 'survivor'
+EXTINCTION = 'extinction'
+TIMEOUT = 'timeout'
+
+
+@dataclass
+class GameResult:
+    ticks: int
+    elapsed: float
+    ending: str
+    winner: Optional[int]
+    lengths: dict[int, int] = field(default_factory=dict)
+    deaths: dict[int, int] = field(default_factory=dict)
+    alive_ticks: dict[int, int] = field(default_factory=dict)
+
+    def ticks_per_second(self) -> float:
+        return self.ticks / self.elapsed if self.elapsed > 0 else float('inf')
+
+
+def game_is_over(world: SnakeWorld) -> bool:
+    """Returns True if the game can not evolve anymore: the dead snakes never
+    respawn and at most one snake is still alive.
+    """
+    return world.initial_respawn_cooldown == float('inf') and len(world.alive_agents) <= 1
+
+
+def run_game(world: SnakeWorld, max_ticks: int) -> GameResult:
+    """Resets the world and simulates it without any display until the game is
+    over or `max_ticks` ticks have been simulated.
+
+    The winner is the last snake alive, or if the game is not over, the longest
+    snake alive (the one with the smallest id in case of a tie).
+    """
+    world.reset()
+    agents = list(world.iter_alive_agents())
+    deaths = {agent.get_id(): 0 for agent in agents}
+    alive_ticks = {agent.get_id(): 0 for agent in agents}
+
+    ticks = 0
+    start = perf_counter()
+    while ticks != max_ticks and not game_is_over(world):
+        for agent in world.iter_alive_agents():
+            alive_ticks[agent.get_id()] += 1
+        for agent in world.simulate():
+            deaths[agent.get_id()] += 1
+        ticks += 1
+    elapsed = perf_counter() - start
+
+    alive_agents = sorted(world.iter_alive_agents(), key=lambda a: (-len(a), a.get_id()))
+    if len(alive_agents) == 0:
+        ending, winner = EXTINCTION, None
+    elif game_is_over(world):
+        ending, winner = SURVIVOR, alive_agents[0].get_id()
+    else:
+        ending, winner = TIMEOUT, alive_agents[0].get_id()
+
+    lengths = {agent.get_id(): (len(agent) if agent.is_alive() else 0) for agent in agents}
+    return GameResult(ticks, elapsed, ending, winner, lengths, deaths, alive_ticks)
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import TYPE_CHECKING, Generic, TypeVar
+
+if TYPE_CHECKING:
+    from typing import Iterator
+
+    from back.type_hints import Position
+
+
+Item = TypeVar('Item')
+
+BUCKET_SIZE = 16
+
+
+class BucketGrid(Generic[Item]):
+    """Items placed on the positions of a torus grid, bucketed into square
+    buckets of `bucket_size` cells of side, so that the items near a position
+    are found by looking into a few buckets instead of all the items.
+    """
+    def __init__(self, width: int, height: int, bucket_size: int=BUCKET_SIZE) -> None:
+        assert bucket_size > 0
+        self.width = width
+        self.height = height
+        self.bucket_size = bucket_size
+        self.n_columns = -(-width // bucket_size)
+        self.n_rows = -(-height // bucket_size)
+        self.buckets: defaultdict[tuple[int, int], list[tuple[Position, Item]]] = defaultdict(list)
+
+    def _bucket_range(self, c: int, radius: int, size: int, n_buckets: int) -> range|list[int]:
+        """Returns the indices of the buckets which overlap the coordinates
+        within `radius` of the coordinate `c`, on an axis of `size` cells.
+        """
+        if 2 * radius + 1 >= size:
+            return range(n_buckets)
+        lo, hi = (c - radius) % size, (c + radius) % size
+        lo_bucket, hi_bucket = lo // self.bucket_size, hi // self.bucket_size
+        if lo <= hi:
+            return range(lo_bucket, hi_bucket + 1)
+        # the interval wraps around the axis, its two ends may share buckets
+        if lo_bucket <= hi_bucket:
+            return range(n_buckets)
+        return [*range(lo_bucket, n_buckets), *range(0, hi_bucket + 1)]
+
+    def clear(self) -> None:
+        self.buckets.clear()
+
+    def add(self, p: Position, item: Item) -> None:
+        self.buckets[p[0] // self.bucket_size, p[1] // self.bucket_size].append((p, item))
+
+    def iter_near(self, p: Position, radius: int) -> Iterator[tuple[Position, Item]]:
+        """Iterates over the items whose positions are within `radius` of `p`
+        along each axis, and possibly over a few items a bit further, as
+        (position, item) tuples.
+        """
+        rows = self._bucket_range(p[1], radius, self.height, self.n_rows)
+        for column in self._bucket_range(p[0], radius, self.width, self.n_columns):
+            for row in rows:
+                bucket = self.buckets.get((column, row))
+                if bucket is not None:
+                    yield from bucket
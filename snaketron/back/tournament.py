@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from random import Random
+from typing import TYPE_CHECKING
+
+from back.agent import AStarOffensiveSnakeAgent
+from back.game import starting_positions
+from back.simulation import run_game
+from back.world import (EuclidianDistanceHeuristic,
+                        EuclidianDistancePeriodicHeuristic,
+                        ManhattanDistanceHeuristic, SnakeWorld)
+
+if TYPE_CHECKING:
+    from typing import Iterable, Optional, Sequence
+
+
+# the starting positions of the games only hold four snakes
+MAX_SEATS = 4
+
+HEURISTICS = {
+    'euclidian': EuclidianDistanceHeuristic,
+    'manhattan': ManhattanDistanceHeuristic,
+    'euclidian_periodic': EuclidianDistancePeriodicHeuristic,
+}
+
+
+@dataclass(frozen=True)
+class AgentSpec:
+    """Configuration of an `AStarOffensiveSnakeAgent`."""
+    heuristic: str
+    caution: int
+    attack_anticipation: int
+    latency: int=0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.heuristic}/caution={self.caution}/"
+            f"anticipation={self.attack_anticipation}/latency={self.latency}"
+        )
+
+
+@dataclass(frozen=True)
+class MatchSpec:
+    """Everything a worker needs to play a game, and nothing more."""
+    seed: int
+    width: int
+    height: int
+    n_food: int
+    respawn_cooldown: Optional[int]
+    max_ticks: int
+    agents: tuple[AgentSpec, ...]
+
+
+@dataclass(frozen=True)
+class MatchRecord:
+    """Compact result of a game, the statistics of the agents being given in
+    the order of the match specification.
+    """
+    seed: int
+    ticks: int
+    ending: str
+    winner: Optional[int]
+    lengths: tuple[int, ...]
+    deaths: tuple[int, ...]
+    alive_ticks: tuple[int, ...]
+
+
+@dataclass
+class AgentStats:
+    games: int=0
+    wins: int=0
+    total_length: int=0
+    total_deaths: int=0
+    total_alive_ticks: int=0
+    total_ticks: int=0
+
+    def win_rate(self) -> float:
+        return self.wins / self.games if self.games > 0 else 0.
+
+    def mean_length(self) -> float:
+        return self.total_length / self.games if self.games > 0 else 0.
+
+    def survival(self) -> float:
+        """Returns the fraction of the ticks during which the agent was alive."""
+        return self.total_alive_ticks / self.total_ticks if self.total_ticks > 0 else 0.
+
+
+def build_match(spec: MatchSpec) -> SnakeWorld:
+    """Builds the world of a game between AI snakes, each one attacking all the
+    others.
+    """
+    if not (0 < len(spec.agents) <= MAX_SEATS):
+        raise ValueError(f"A match is played by 1 to {MAX_SEATS} snakes")
+
+    world = SnakeWorld(spec.width, spec.height, spec.n_food, spec.respawn_cooldown, spec.seed)
+    agents: list[AStarOffensiveSnakeAgent] = []
+    for agent_spec, (init_pos, init_dir) in zip(spec.agents, starting_positions(spec.height, spec.width)):
+        agents.append(AStarOffensiveSnakeAgent(
+            world, init_pos, init_dir,
+            HEURISTICS[agent_spec.heuristic],
+            latency=agent_spec.latency,
+            caution=agent_spec.caution,
+            attack_anticipation=agent_spec.attack_anticipation,
+            reuse_path=True
+        ))
+
+    for agent in agents:
+        for opponent in agents:
+            if opponent is not agent:
+                agent.add_opponent(opponent)
+        world.attach_agent(agent)
+    return world
+
+
+def play_match(spec: MatchSpec) -> MatchRecord:
+    """Plays a game in the current process and returns its compact record."""
+    world = build_match(spec)
+    result = run_game(world, spec.max_ticks)
+    agent_ids = range(len(spec.agents))
+    return MatchRecord(
+        spec.seed,
+        result.ticks,
+        result.ending,
+        result.winner,
+        tuple(result.lengths[i] for i in agent_ids),
+        tuple(result.deaths[i] for i in agent_ids),
+        tuple(result.alive_ticks[i] for i in agent_ids)
+    )
+
+
+def make_matches(
+    roster: Sequence[AgentSpec],
+    n_games: int,
+    seats: int,
+    width: int,
+    height: int,
+    n_food: int,
+    respawn_cooldown: Optional[int],
+    max_ticks: int,
+    first_seed: int=0
+) -> list[MatchSpec]:
+    """Creates the specifications of `n_games` games, each one with its own seed
+    and a matchup of `seats` distinct agents drawn from the roster with this
+    seed.
+    """
+    if not (0 < seats <= min(MAX_SEATS, len(roster))):
+        raise ValueError(f"A match seats 1 to {min(MAX_SEATS, len(roster))} agents of the roster")
+
+    matches = []
+    for seed in range(first_seed, first_seed + n_games):
+        rng = Random(seed)
+        agents = rng.sample(roster, seats)
+        matches.append(MatchSpec(seed, width, height, n_food, respawn_cooldown, max_ticks, tuple(agents)))
+    return matches
+
+
+def run_tournament(
+    matches: Sequence[MatchSpec],
+    n_workers: Optional[int]=None
+) -> Iterable[tuple[MatchSpec, MatchRecord]]:
+    """Plays the games in a pool of `n_workers` processes (one per core by
+    default) and yields each specification with its record, in order. Only the
+    specifications and the records cross the process boundaries.
+    """
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    if n_workers == 1:
+        for spec in matches:
+            yield spec, play_match(spec)
+        return
+
+    chunksize = max(1, len(matches) // (4 * n_workers))
+    # the pool machinery is slow to import, and only needed to play in parallel
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        yield from zip(matches, executor.map(play_match, matches, chunksize=chunksize))
+
+
+def aggregate(results: Iterable[tuple[MatchSpec, MatchRecord]]) -> dict[AgentSpec, AgentStats]:
+    """Aggregates the records of the games per agent configuration."""
+    stats: dict[AgentSpec, AgentStats] = {}
+    for spec, record in results:
+        for i, agent_spec in enumerate(spec.agents):
+            agent_stats = stats.setdefault(agent_spec, AgentStats())
+            agent_stats.games += 1
+            agent_stats.wins += (record.winner == i)
+            agent_stats.total_length += record.lengths[i]
+            agent_stats.total_deaths += record.deaths[i]
+            agent_stats.total_alive_ticks += record.alive_ticks[i]
+            agent_stats.total_ticks += record.ticks
+    return stats
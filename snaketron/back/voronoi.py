@@ -3,7 +3,6 @@ from __future__ import annotations
 from typing import TYPE_CHECKING
 
 import numpy as np
-from scipy.spatial import QhullError, Voronoi
 
 if TYPE_CHECKING:
     from typing import Literal, Optional, TypeAlias
@@ -15,6 +14,10 @@ def furthest_voronoi_vertex(points: PointArray, x_lim: float, y_lim: float) -> O
     if points.shape[0] == 0:
         return
 
+    # scipy takes longer to import than the whole back-end, and is only needed
+    # by this function
+    from scipy.spatial import QhullError, Voronoi
+
     try:
         vor = Voronoi(points)
     except QhullError:
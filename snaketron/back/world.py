@@ -1,21 +1,55 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from collections import deque
-from random import randrange, shuffle
+from collections import Counter, deque
+from random import Random
 from typing import TYPE_CHECKING
 
 import numpy as np
+from back.a_star import SearchWorkspace
 from back.direction import DOWN, LEFT, RIGHT, UP, toward_center
-from back.voronoi import furthest_voronoi_vertex
+from back.distance_field import torus_manhattan_distance, wavefront
+from back.free_cells import FreeCellIndex
+from back.profiler import CUT, DECIDE, EAT, KILL, MOVE, RESPAWN, SPAWN_FOOD
+from back.spatial_index import BucketGrid
 
 if TYPE_CHECKING:
-    from typing import Iterator, Optional, Sequence
+    from typing import Iterable, Iterator, Optional, Sequence
 
+    from back.a_star import SearchBudget
     from back.agent import AbstractSnakeAgent
+    from back.delta import WorldDelta
+    from back.profiler import TickProfiler
+    from back.replay import ReplayRecorder
     from back.type_hints import Direction, Position
 
 
+def find_spawn_pos(
+    obstacle_count: np.ndarray,
+    snake_mask: np.ndarray,
+    n_alive_agents: int
+) -> Optional[Position]:
+    """Returns the free position of a grid which is the furthest from the cells
+    of the alive snakes, given by `snake_mask`, by Manhattan distance on the
+    torus, or None if no position is free. When there are few snakes, the
+    middles of the grid's edges repel too.
+    """
+    width, height = obstacle_count.shape
+    repellent_mask = snake_mask.copy()
+    if n_alive_agents <= 2:
+        half_x, half_y = (width - 1) // 2, (height - 1) // 2
+        repellent_mask[[half_x, half_x, 0, width - 1], [0, height - 1, half_y, half_y]] = True
+    if not repellent_mask.any():
+        return None
+
+    dist_field = torus_manhattan_distance(repellent_mask)
+    dist_field[obstacle_count != 0] = -1
+    cell = int(np.argmax(dist_field))
+    if dist_field.flat[cell] < 0:
+        return None
+    return divmod(cell, height)
+
+
 class AbstractGridGraph(ABC):
     @abstractmethod
     def get_width(self) -> int:
@@ -82,7 +116,8 @@ class SnakeWorld(AbstractGridGraph):
         width: int,
         height: int,
         n_food: int,
-        respawn_cooldown: Optional[int]=None
+        respawn_cooldown: Optional[int]=None,
+        seed: Optional[int]=None
     ) -> None:
         assert width > 0 and height > 0
         assert n_food >= 0
@@ -96,11 +131,32 @@ class SnakeWorld(AbstractGridGraph):
         else:
             self.initial_respawn_cooldown = respawn_cooldown
 
+        # every random decision of the world is drawn from its own generator
+        self.rng = Random(seed)
+
         self.obstacle_count = np.zeros((self.width, self.height), dtype=np.uint8)
+        # number of snake cells on each position, the virtual obstacles excluded
+        self.snake_cell_count = np.zeros((self.width, self.height), dtype=np.uint8)
         self.food_pos: set[Position] = set()
+        # index of the positions without obstacle nor food, brought up to date
+        # with the positions whose content changed only when a food is spawned
+        self.free_cells = FreeCellIndex(self.width, self.height)
+        self.dirty_cells: set[Position] = set()
         self.respawn_cooldown = self.initial_respawn_cooldown
         self.alive_agents: list[AbstractSnakeAgent] = []
         self.dead_agents: deque[AbstractSnakeAgent] = deque()
+        # heads of the alive agents and foods bucketed by position, as they are
+        # at the beginning of the tick, rebuilt on the first query of a tick
+        self.head_buckets: BucketGrid[AbstractSnakeAgent] = BucketGrid(self.width, self.height)
+        self.food_buckets: BucketGrid[None] = BucketGrid(self.width, self.height)
+        self.buckets_are_stale = True
+        # distance and direction fields toward the foods, shared by the agents
+        # during a tick and computed on the first request of the tick
+        self.food_field: Optional[tuple[np.ndarray, np.ndarray]] = None
+        self.search_workspace = SearchWorkspace(self.width, self.height)
+        self.recorder: Optional[ReplayRecorder] = None
+        self.profiler: Optional[TickProfiler] = None
+        self.delta: Optional[WorldDelta] = None
 
     def __repr__(self) -> str:
         repr_grid = [['  .  '  for x in range(self.width)] for y in range(self.height)]
@@ -112,62 +168,151 @@ class SnakeWorld(AbstractGridGraph):
         return '\n'.join(''.join(row) for row in repr_grid) + '\n'
 
     # ---- private
-    def _consume_food(self, p: Position) -> bool:
-        """If a food and only one snake head is at position `p`, despawn this food
-        and returns True. Else, returns False.
+    def _consume_food(self, p: Position, head_count: int) -> bool:
+        """If a food and only one snake head (`head_count` being the number of
+        heads) is at position `p`, despawn this food and returns True. Else,
+        returns False.
         """
-        if p in self.food_pos:
-            head_count = sum((agent.get_head() == p) for agent in self.alive_agents)
-            if head_count == 1:
-                self.food_pos.remove(p)
-                return True
+        if head_count == 1 and p in self.food_pos:
+            self.food_pos.remove(p)
+            self.dirty_cells.add(p)
+            return True
         return False
 
-    def _find_available_food_pos(self, max_try: int=20) -> Optional[Position]:
-        """Tries to find an available position to spawn a new food and returns
-        it if found.
+    def _update_free_cells(self) -> None:
+        """Brings the free-cell index up to date with the positions whose content
+        changed, in flat order so that the index only depends on the state of
+        the world.
         """
-        for _ in range(max_try):
-            pos = (randrange(self.width), randrange(self.height))
+        for pos in sorted(self.dirty_cells):
+            cell = pos[0] * self.height + pos[1]
             if self.obstacle_count[pos] == 0 and pos not in self.food_pos:
-                return pos
+                self.free_cells.add(cell)
+            else:
+                self.free_cells.discard(cell)
+        self.dirty_cells.clear()
+
+    def _find_available_food_pos(self) -> Optional[Position]:
+        """Draws uniformly a position without obstacle nor food to spawn a new
+        food, and returns it if there is one.
+        """
+        self._update_free_cells()
+        if len(self.free_cells) == 0:
+            return None
+        return divmod(self.free_cells.draw(self.rng), self.height)
 
-    def _spawn_missing_food(self) -> None:
+    def _spawn_missing_food(self) -> list[Position]:
+        """Spawns the missing foods and returns their positions."""
         # q, r = divmod(len(self.alive_agents), 2)
         # n_food = q + (r != 0)
         # for _ in range(n_food - len(self.food_pos)):
+        spawned_pos = []
         for _ in range(self.initial_n_food - len(self.food_pos)):
             pos = self._find_available_food_pos()
             if pos is None:
                 break
             self.food_pos.add(pos)
+            self.free_cells.discard(pos[0] * self.height + pos[1])
+            spawned_pos.append(pos)
+        if self.delta is not None:
+            for pos in spawned_pos:
+                self.delta.add_food(pos)
+        return spawned_pos
 
 
     def _kill_agents(self, deads: Sequence[AbstractSnakeAgent]) -> None:
+        if len(deads) == 0:
+            return
+        # filters the alive agents once rather than removing each dead one
+        dead_set = set(deads)
+        self.alive_agents[:] = [agent for agent in self.alive_agents if agent not in dead_set]
+        self.dead_agents.extend(deads)
+
+    def _update_buckets(self) -> None:
+        """Buckets the heads of the alive agents and the foods again if the
+        world changed since they were last bucketed.
+        """
+        if not self.buckets_are_stale:
+            return
+        self.head_buckets.clear()
+        for agent in self.alive_agents:
+            self.head_buckets.add(agent.get_head(), agent)
+        self.food_buckets.clear()
+        for pos in self.food_pos:
+            self.food_buckets.add(pos, None)
+        self.buckets_are_stale = False
+
+    def _decide_directions(self) -> list[Direction]:
+        """Makes the alive agents decide their directions and returns them."""
+        if self.profiler is None:
+            for agent in self.alive_agents:
+                agent.decide_direction()
+        else:
+            for agent in self.alive_agents:
+                self.profiler.decide_direction(agent)
+        return [agent.get_direction() for agent in self.alive_agents]
+
+    def _move_agents(self, directions: Sequence[Direction]) -> None:
+        for agent, d in zip(self.alive_agents, directions):
+            agent.move(d)
+        if self.delta is not None:
+            for agent in self.alive_agents:
+                self.delta.record_move(agent)
+
+    def _cut_agents(self) -> None:
+        """Cuts the tail of the snakes which eat it."""
+        cut_lengths: list[int] = []
+        for agent in self.alive_agents:
+            cut_lengths.append(agent.check_self_collision())
+        for agent, cut_len in zip(self.alive_agents, cut_lengths):
+            if self.delta is not None and cut_len > 0:
+                self.delta.record_cut(agent, cut_len)
+            agent.cut(cut_len)
+
+    def _feed_agents(self) -> None:
+        """Makes the snakes which eat a food grow."""
+        growing: list[AbstractSnakeAgent] = []
+        head_counts = Counter(agent.get_head() for agent in self.alive_agents)
+        for agent in self.alive_agents:
+            head = agent.get_head()
+            if self._consume_food(head, head_counts[head]):
+                growing.append(agent)
+                if self.delta is not None:
+                    self.delta.pop_food(head)
+        for agent in growing:
+            if agent.grow() and self.delta is not None:
+                self.delta.record_growth(agent)
+
+    def _kill_colliding_agents(self) -> list[AbstractSnakeAgent]:
+        """Kills each snake which collides another snake and returns them."""
+        deads = [agent for agent in self.alive_agents if agent.collides_another()]
         for agent in deads:
-            self.alive_agents.remove(agent)
-            self.dead_agents.append(agent)
+            if self.delta is not None:
+                self.delta.record_death(agent)
+            agent.die()
+        self.rng.shuffle(deads)
+        self._kill_agents(deads)
+        return deads
 
     def _find_agent_spawn_pos(self) -> Optional[Position]:
         """Tries to find a position to spawn an agent and returns it if found."""
-        repellent_pos = []
-        for agent in self.alive_agents:
-            repellent_pos.extend(agent.iter_cells())
-        if len(self.alive_agents) <= 2:
-            max_x, max_y = self.width - 1., self.height - 1.
-            half_x, half_y = .5 * max_x, .5 * max_y
-            repellent_pos.extend((
-                (half_x, 0.), (half_x, max_y), (0., half_y), (max_x, half_y)
-            ))
-
-        vertex = furthest_voronoi_vertex(np.array(repellent_pos), self.width, self.height)
-        if vertex is not None:
-            x, y = vertex
-            spawn_pos = (int(x), int(y))
-            if self.obstacle_count[spawn_pos] == 0:
-                return spawn_pos
-
-    def _respawn_dead_agent(self) -> None:
+        return find_spawn_pos(self.obstacle_count, self.snake_cell_count > 0, len(self.alive_agents))
+
+    def _spawn_agent(self, agent: AbstractSnakeAgent, spawn_pos: Position) -> None:
+        """Brings back a dead agent to life, coiled on the position `spawn_pos`."""
+        spawn_length = agent.get_initial_length()
+        spawn_dir = toward_center(*spawn_pos, self.width, self.height)
+
+        agent.reset([spawn_pos] * spawn_length, spawn_dir)
+        self.alive_agents.append(agent)
+        self.obstacle_count[spawn_pos] += spawn_length
+        self.snake_cell_count[spawn_pos] += spawn_length
+        self.dirty_cells.add(spawn_pos)
+
+    def _respawn_dead_agent(self) -> Optional[AbstractSnakeAgent]:
+        """Respawns the first dead agent if the respawn cooldown is over, and
+        returns it if it has been respawned.
+        """
         if len(self.dead_agents) == 0:
             return
 
@@ -180,13 +325,11 @@ class SnakeWorld(AbstractGridGraph):
             return
 
         agent = self.dead_agents.popleft()
-        spawn_length = agent.get_initial_length()
-        spawn_dir = toward_center(*spawn_pos, self.width, self.height)
-
-        agent.reset([spawn_pos] * spawn_length, spawn_dir)
-        self.alive_agents.append(agent)
-        self.obstacle_count[spawn_pos] += spawn_length
+        self._spawn_agent(agent, spawn_pos)
         self.respawn_cooldown += self.initial_respawn_cooldown
+        if self.delta is not None:
+            self.delta.record_respawn(agent)
+        return agent
 
 
     # ---- public
@@ -197,14 +340,46 @@ class SnakeWorld(AbstractGridGraph):
         return self.height
 
 
+    def seed(self, seed: Optional[int]) -> None:
+        """Reinitializes the random generator of the world."""
+        self.rng.seed(seed)
+
+    def get_rng_state(self) -> object:
+        """Returns the state of the random generator of the world."""
+        return self.rng.getstate()
+
+    def set_rng_state(self, state: object) -> None:
+        """Restores a state returned by `get_rng_state`."""
+        self.rng.setstate(state)
+
+
     def pop_obstacle(self, p: Position) -> None:
         """Removes an obstacle from the position `p`."""
         assert self.obstacle_count[p] > 0
         self.obstacle_count[p] -= 1
+        self.dirty_cells.add(p)
 
     def add_obstacle(self, p: Position) -> None:
         """Puts an obstacle on the position `p`."""
         self.obstacle_count[p] += 1
+        self.dirty_cells.add(p)
+
+    def add_snake_cell(self, p: Position) -> None:
+        """Puts a snake cell, which is an obstacle, on the position `p`."""
+        self.obstacle_count[p] += 1
+        self.snake_cell_count[p] += 1
+        self.dirty_cells.add(p)
+
+    def pop_snake_cell(self, p: Position) -> None:
+        """Removes a snake cell from the position `p`."""
+        assert self.snake_cell_count[p] > 0
+        self.obstacle_count[p] -= 1
+        self.snake_cell_count[p] -= 1
+        self.dirty_cells.add(p)
+
+    def get_snake_cell_count(self, p: Position) -> int:
+        """Returns the number of snake cells on the position `p`."""
+        return self.snake_cell_count[p]
 
     def pos_is_free(self, p: Position) -> bool:
         """Returns True if there is no obstacle on the position `p`, False otherwise."""
@@ -214,6 +389,13 @@ class SnakeWorld(AbstractGridGraph):
     def get_neighbor(self, p: Position, d: Direction) -> Position:
         return (p[0] + d[0]) % self.width, (p[1] + d[1]) % self.height
 
+    def get_distance(self, p: Position, q: Position) -> int:
+        """Returns the length of the shortest path between `p` and `q`, as if
+        there were no obstacle.
+        """
+        dx, dy = abs(p[0] - q[0]), abs(p[1] - q[1])
+        return min(dx, self.width - dx) + min(dy, self.height - dy)
+
     def iter_free_neighbors(self, p: Position) -> Iterator[tuple[Position, Direction]]:
         x, y = p
         up_neighbor = (x, (y-1) % self.height)
@@ -231,10 +413,67 @@ class SnakeWorld(AbstractGridGraph):
             yield right_neighbor, RIGHT
 
 
+    def compute_distance_field(self, sources: Iterable[Position], max_distance: int=-1) -> np.ndarray:
+        """Returns an array giving for each position the length of the shortest
+        path to the nearest source, or -1 if no source can be reached. The
+        search stops after `max_distance` steps if it is not negative.
+        """
+        dist_field, _ = wavefront(self.obstacle_count == 0, sources, max_distance)
+        return dist_field
+
+    def compute_direction_field(
+        self,
+        sources: Iterable[Position],
+        max_distance: int=-1
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the distance field from the sources, and an array giving for
+        each position the code of the direction to follow to get closer to its
+        nearest source (see `back.direction.code_direction`).
+        """
+        return wavefront(self.obstacle_count == 0, sources, max_distance, with_directions=True)
+
+    def get_food_field(self, budget: Optional[SearchBudget]=None) -> Optional[tuple[np.ndarray, np.ndarray]]:
+        """Returns the distance and direction fields toward the nearest free food,
+        as given by `compute_direction_field`. They are computed once per tick
+        and shared by the agents, so they ignore the virtual obstacles added
+        during the tick: only the agents which added none may follow them.
+
+        Computing the fields visits every position, which is charged to
+        `budget` if given. If the budget can not afford it, the fields are not
+        computed and None is returned.
+        """
+        if self.food_field is None:
+            area = self.width * self.height
+            if budget is not None and not budget.can_afford(area):
+                return None
+            self.food_field = self.compute_direction_field(p for p in self.food_pos if self.pos_is_free(p))
+            if budget is not None:
+                budget.consume(area, False)
+        return self.food_field
+
+
+    def get_search_workspace(self) -> SearchWorkspace:
+        """Returns the workspace shared by the path searches made in the world."""
+        return self.search_workspace
+
+
     def iter_food(self) -> Iterator[Position]:
         """Iterates over each food position of the world."""
         return iter(self.food_pos)
 
+    def pos_has_food(self, p: Position) -> bool:
+        """Returns True if there is a food on the position `p`, False otherwise."""
+        return p in self.food_pos
+
+    def iter_food_near(self, p: Position, radius: int) -> Iterator[Position]:
+        """Iterates over the foods at most at `radius` from `p`, as they were at
+        the beginning of the tick.
+        """
+        self._update_buckets()
+        for food, _ in self.food_buckets.iter_near(p, radius):
+            if self.get_distance(p, food) <= radius:
+                yield food
+
 
     def attach_agent(self, agent: AbstractSnakeAgent, alive: bool=True) -> None:
         """Adds a new agent in the world."""
@@ -248,12 +487,47 @@ class SnakeWorld(AbstractGridGraph):
         """Returns the agents of the world which are still alive."""
         return iter(self.alive_agents)
 
+    def iter_agents_near(self, p: Position, radius: int) -> Iterator[AbstractSnakeAgent]:
+        """Iterates over the alive agents whose heads are at most at `radius`
+        from `p`, as they were at the beginning of the tick.
+        """
+        self._update_buckets()
+        for head, agent in self.head_buckets.iter_near(p, radius):
+            if self.get_distance(p, head) <= radius:
+                yield agent
+
+    def iter_agents(self) -> Iterator[AbstractSnakeAgent]:
+        """Returns all the agents of the world, sorted by id."""
+        return iter(sorted((*self.alive_agents, *self.dead_agents), key=lambda a: a.get_id()))
+
+
+    def set_recorder(self, recorder: Optional[ReplayRecorder]) -> None:
+        """Makes a recorder log the next game of the world, or stops logging if
+        `recorder` is None. The recording starts at the next reset.
+        """
+        self.recorder = recorder
+
+    def set_profiler(self, profiler: Optional[TickProfiler]) -> None:
+        """Makes a profiler record the timings of the next ticks, or stops
+        profiling if `profiler` is None.
+        """
+        self.profiler = profiler
+
+    def set_delta(self, delta: Optional[WorldDelta]) -> None:
+        """Makes the world accumulate its changes into `delta` from the next
+        tick or reset, or stops if `delta` is None.
+        """
+        self.delta = delta
+
 
     def reset(self) -> None:
         """Reset the world and all its agents to make them ready to start a new game."""
         self.obstacle_count.fill(0)
+        self.snake_cell_count.fill(0)
 
         self.food_pos.clear()
+        self.free_cells.rebuild(np.ones(self.width * self.height, dtype=np.bool_))
+        self.dirty_cells.clear()
         self._spawn_missing_food()
 
         self.respawn_cooldown = self.initial_respawn_cooldown
@@ -263,48 +537,66 @@ class SnakeWorld(AbstractGridGraph):
             agent.reset()
             for pos in agent.iter_cells():
                 self.obstacle_count[pos] += 1
+                self.snake_cell_count[pos] += 1
+                self.dirty_cells.add(pos)
+
+        self.buckets_are_stale = True
+        self.food_field = None
+
+        if self.recorder is not None:
+            self.recorder.record_reset(self)
+        if self.delta is not None:
+            self.delta.record_reset()
 
     def simulate(self) -> list[AbstractSnakeAgent]:
         """Simulates one step of the world evolution and returns the agents
         which died during this simulation step.
         """
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start_tick(self)
+
         # moves the snakes
-        directions: list[Direction] = []
-        for agent in self.alive_agents:
-            agent.decide_direction()
-            directions.append(agent.get_direction())
-        for agent, d in zip(self.alive_agents, directions):
-            agent.move(d)
+        directions = self._decide_directions()
+        if profiler is not None:
+            profiler.end_phase(DECIDE)
+        if self.recorder is not None:
+            self.recorder.record_directions(self.alive_agents, directions)
+        self._move_agents(directions)
+        if profiler is not None:
+            profiler.end_phase(MOVE)
 
         # resolves the snakes which eat their own tail
-        cut_lengths: list[int] = []
-        for agent in self.alive_agents:
-            cut_lengths.append(agent.check_self_collision())
-        for agent, cut_len in zip(self.alive_agents, cut_lengths):
-            agent.cut(cut_len)
+        self._cut_agents()
+        if profiler is not None:
+            profiler.end_phase(CUT)
 
         # resolves the snakes which eat food and grow
-        growing: list[AbstractSnakeAgent] = []
-        for agent in self.alive_agents:
-            if self._consume_food(agent.get_head()):
-                growing.append(agent)
-        for agent in growing:
-            agent.grow()
+        self._feed_agents()
+        if profiler is not None:
+            profiler.end_phase(EAT)
 
         # kills each snake which collides another snake
-        deads: list[AbstractSnakeAgent] = []
-        for agent in self.alive_agents:
-            if agent.collides_another():
-                agent.die()
-                deads.append(agent)
-        shuffle(deads)
-        self._kill_agents(deads)
+        deads = self._kill_colliding_agents()
+        if profiler is not None:
+            profiler.end_phase(KILL)
 
         # respawns the foods which has been eaten
-        self._spawn_missing_food()
+        spawned_food = self._spawn_missing_food()
+        if profiler is not None:
+            profiler.end_phase(SPAWN_FOOD)
 
         # respawns dead snakes
-        self._respawn_dead_agent()
-
+        respawned_agent = self._respawn_dead_agent()
+        if profiler is not None:
+            profiler.end_phase(RESPAWN)
+            profiler.end_tick()
+
+        if self.recorder is not None:
+            self.recorder.record_events(self, spawned_food, respawned_agent)
+        self.buckets_are_stale = True
+        self.food_field = None
+        if self.delta is not None:
+            self.delta.end_tick()
 
         return deads
@@ -0,0 +1,157 @@
+"""Verifies tick for tick that `BatchedSnakeWorld` plays the same games as
+`SnakeWorld`, and compares their simulation throughput.
+
+Run from the `snaketron` directory with:
+    python -m benchmarks.batched_world
+"""
+from __future__ import annotations
+
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+import numpy as np
+from back.batched_world import BatchedSnakeWorld
+from back.direction import code_direction, direction_code
+from back.game import build_game, starting_positions
+from back.world import SnakeWorld
+from benchmarks.common import ScriptedSnakeAgent
+
+if TYPE_CHECKING:
+    from back.type_hints import Position
+
+
+SIZE = 21
+N_FOOD = 3
+RESPAWN_COOLDOWN = 10
+N_VERIFIED_GAMES = 8
+N_VERIFIED_TICKS = 300
+BATCH_SIZES = (1, 10, 100, 1000)
+N_BENCHMARK_TICKS = 100
+
+
+def snapshot(world: SnakeWorld) -> tuple:
+    bodies = {a.get_id(): list(a.pos) for a in world.iter_alive_agents()}
+    dead_agents = [a.get_id() for a in world.dead_agents]
+    return world.obstacle_count.copy(), set(world.iter_food()), bodies, dead_agents
+
+
+def batched_snapshot(batched: BatchedSnakeWorld, k: int) -> tuple:
+    bodies = {
+        a: batched.get_agent_cells(k, a)
+        for a in range(batched.n_agents) if batched.alive[k, a]
+    }
+    return batched.obstacle_count[k].copy(), set(batched.iter_food(k)), bodies, list(batched.dead_agents[k])
+
+
+def record_ai_game(seed: int) -> tuple[list[list[Position]], list[np.ndarray], list[tuple]]:
+    """Plays a game between AI snakes, and records the directions they took and
+    the state of the world after each tick.
+    """
+    world, _, ai_agents = build_game(SIZE, SIZE, N_FOOD, 4, 0, RESPAWN_COOLDOWN, seed)
+    initial_positions = [a.initial_pos for a in ai_agents]
+    world.reset()
+
+    directions, states = [], []
+    for _ in range(N_VERIFIED_TICKS):
+        alive_agents = list(world.iter_alive_agents())
+        world.simulate()
+        codes = np.ones(len(ai_agents), dtype=np.int64)
+        for agent in alive_agents:
+            codes[agent.get_id()] = direction_code(agent.get_direction())
+        directions.append(codes)
+        states.append(snapshot(world))
+    return initial_positions, directions, states
+
+
+def record_random_game(seed: int) -> tuple[list[list[Position]], list[np.ndarray], list[tuple]]:
+    """Plays a game between snakes moving randomly, which often eat their own
+    tail, and records the directions they took and the state of the world after
+    each tick.
+    """
+    initial_positions = [pos for pos, _ in starting_positions(SIZE, SIZE)]
+    world = SnakeWorld(SIZE, SIZE, N_FOOD, RESPAWN_COOLDOWN, seed)
+    agents = [ScriptedSnakeAgent(world, pos) for pos in initial_positions]
+    for agent in agents:
+        world.attach_agent(agent)
+    direction_rng = np.random.default_rng(seed)
+    world.reset()
+
+    directions, states = [], []
+    for _ in range(N_VERIFIED_TICKS):
+        codes = direction_rng.integers(1, 5, size=len(agents))
+        for agent, code in zip(agents, codes):
+            agent.dir = code_direction(code)
+        world.simulate()
+        directions.append(codes)
+        states.append(snapshot(world))
+    return initial_positions, directions, states
+
+
+def verify() -> None:
+    for record in (record_ai_game, record_random_game):
+        seeds = list(range(N_VERIFIED_GAMES))
+        games = [record(seed) for seed in seeds]
+        batched = BatchedSnakeWorld(
+            len(seeds), SIZE, SIZE, N_FOOD, games[0][0], RESPAWN_COOLDOWN, seeds=seeds
+        )
+        batched.reset()
+        for tick in range(N_VERIFIED_TICKS):
+            batched.simulate(np.stack([directions[tick] for _, directions, _ in games]))
+            for k, (_, _, states) in enumerate(games):
+                expected = states[tick]
+                actual = batched_snapshot(batched, k)
+                assert np.array_equal(expected[0], actual[0]), f"{record.__name__}: obstacles of game {k} at tick {tick}"
+                assert expected[1:] == actual[1:], f"{record.__name__}: state of game {k} at tick {tick}"
+        print(f"{record.__name__}: {len(seeds)} games identical during {N_VERIFIED_TICKS} ticks")
+
+
+def benchmark_scalar(n_games: int) -> float:
+    _, _, ai_agents = build_game(SIZE, SIZE, N_FOOD, 4, 0, RESPAWN_COOLDOWN)
+    worlds, agent_lists = [], []
+    for seed in range(n_games):
+        world = SnakeWorld(SIZE, SIZE, N_FOOD, RESPAWN_COOLDOWN, seed)
+        agents = [ScriptedSnakeAgent(world, a.initial_pos) for a in ai_agents]
+        for agent in agents:
+            world.attach_agent(agent)
+        world.reset()
+        worlds.append(world)
+        agent_lists.append(agents)
+
+    direction_rng = np.random.default_rng(0)
+    start = perf_counter()
+    for _ in range(N_BENCHMARK_TICKS):
+        codes = direction_rng.integers(1, 5, size=(n_games, len(ai_agents)))
+        for world, agents, game_codes in zip(worlds, agent_lists, codes.tolist()):
+            for agent, code in zip(agents, game_codes):
+                agent.dir = code_direction(code)
+            world.simulate()
+    return perf_counter() - start
+
+
+def benchmark_batched(n_games: int) -> float:
+    _, _, ai_agents = build_game(SIZE, SIZE, N_FOOD, 4, 0, RESPAWN_COOLDOWN)
+    batched = BatchedSnakeWorld(
+        n_games, SIZE, SIZE, N_FOOD, [a.initial_pos for a in ai_agents], RESPAWN_COOLDOWN,
+        seeds=list(range(n_games))
+    )
+    batched.reset()
+
+    direction_rng = np.random.default_rng(0)
+    start = perf_counter()
+    for _ in range(N_BENCHMARK_TICKS):
+        batched.simulate(direction_rng.integers(1, 5, size=(n_games, len(ai_agents))))
+    return perf_counter() - start
+
+
+def main() -> None:
+    verify()
+    print(f"{'games':>6} {'scalar (game ticks/s)':>22} {'batched (game ticks/s)':>23}")
+    for n_games in BATCH_SIZES:
+        game_ticks = n_games * N_BENCHMARK_TICKS
+        scalar = game_ticks / benchmark_scalar(n_games)
+        batched = game_ticks / benchmark_batched(n_games)
+        print(f"{n_games:>6} {scalar:>22.0f} {batched:>23.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Helpers shared by the benchmarks: scripted snakes, seeded board generation
+and timing.
+"""
+from __future__ import annotations
+
+import random
+from statistics import median
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from back.agent import AbstractSnakeAgent
+from back.game import build_game
+from back.world import SnakeWorld
+
+if TYPE_CHECKING:
+    from typing import Callable, Sequence, TypeVar
+
+    from back.agent import AbstractAISnakeAgent
+    from back.type_hints import Direction, Position
+    State = TypeVar('State')
+
+
+class ScriptedSnakeAgent(AbstractSnakeAgent):
+    """Snake agent moving in the direction it is told."""
+    def __init__(self, world: SnakeWorld, initial_pos: Sequence[Position]) -> None:
+        super().__init__(world, initial_pos)
+        self.dir: Direction = (0, 1)
+
+    def decide_direction(self) -> None:
+        pass
+
+    def get_direction(self) -> Direction:
+        return self.dir
+
+
+def random_free_position(world: SnakeWorld, rng: random.Random) -> Position:
+    while True:
+        pos = (rng.randrange(world.get_width()), rng.randrange(world.get_height()))
+        if world.pos_is_free(pos):
+            return pos
+
+
+def add_random_obstacles(world: SnakeWorld, density: float, rng: random.Random) -> None:
+    """Puts obstacles on about a fraction `density` of the cells of the world."""
+    width, height = world.get_width(), world.get_height()
+    for _ in range(int(density * width * height)):
+        world.add_obstacle((rng.randrange(width), rng.randrange(height)))
+
+
+def mid_game_world(size: int, seed: int, warmup_ticks: int) -> tuple[SnakeWorld, list[AbstractAISnakeAgent]]:
+    """Returns the world of a game between four AI snakes after `warmup_ticks`
+    ticks, with its snakes. The game only depends on the seed.
+    """
+    world, _, ai_agents = build_game(size, size, 3, 4, 0, 10, seed)
+    world.reset()
+    for _ in range(warmup_ticks):
+        world.simulate()
+    return world, list(ai_agents)
+
+
+def measure(setup: Callable[[], State], run: Callable[[State], int], repeat: int) -> dict[str, float]:
+    """Times `repeat` rounds of a workload. Each round prepares a state with
+    `setup`, which is not timed, then calls `run` with it, which returns the
+    number of operations made. Returns the timing of an operation.
+    """
+    round_times = []
+    n_operations = 0
+    for _ in range(repeat):
+        state = setup()
+        start = perf_counter()
+        n_operations = run(state)
+        round_times.append(perf_counter() - start)
+
+    n_operations = max(n_operations, 1)
+    return {
+        'operations': n_operations,
+        'rounds': repeat,
+        'min_s': min(round_times) / n_operations,
+        'median_s': median(round_times) / n_operations,
+        'max_s': max(round_times) / n_operations,
+    }
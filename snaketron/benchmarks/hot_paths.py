@@ -0,0 +1,260 @@
+"""Times the hot paths of the back-end on boards generated from seeds, and
+writes the results as JSON, one entry per benchmark and parameter set, so that
+each hot path can be tracked over time.
+
+Run from the `snaketron` directory with:
+    python -m benchmarks.hot_paths --output results.json
+"""
+from __future__ import annotations
+
+import json
+import platform
+import random
+import sys
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from itertools import product
+from typing import TYPE_CHECKING
+
+import numpy as np
+from back.a_star import shortest_path
+from back.voronoi import furthest_voronoi_vertex
+from back.world import (EuclidianDistanceHeuristic,
+                        EuclidianDistancePeriodicHeuristic,
+                        ManhattanDistanceHeuristic, SnakeWorld,
+                        find_spawn_pos)
+from benchmarks.common import (add_random_obstacles, measure, mid_game_world,
+                               random_free_position)
+
+if TYPE_CHECKING:
+    from argparse import Namespace
+    from typing import Any, Callable, Iterator
+
+    from back.type_hints import Position
+    Result = dict[str, Any]
+
+
+SEED = 0
+REPEAT = 5
+
+SHORTEST_PATH_SIZES = (21, 50, 100)
+SHORTEST_PATH_DENSITIES = (0.1, 0.2, 0.3)
+SHORTEST_PATH_HEURISTICS = {
+    'euclidian': EuclidianDistanceHeuristic,
+    'manhattan': ManhattanDistanceHeuristic,
+    'euclidian_periodic': EuclidianDistancePeriodicHeuristic,
+}
+N_SEARCHES = 20
+
+SIMULATE_SIZES = (21, 50)
+N_SIMULATED_TICKS = 50
+
+VORONOI_POINT_COUNTS = (8, 64, 512)
+VORONOI_GRID_SIZE = 100
+N_VORONOI_CALLS = 20
+
+AVOID_CAUTIONS = (1, 3, 5)
+ATTACK_ANTICIPATIONS = (5, 15, 30)
+AGENT_GRID_SIZE = 50
+WARMUP_TICKS = 100
+N_AGENT_CALLS = 20
+
+
+def bench_shortest_path() -> Iterator[Result]:
+    for size, density, name in product(SHORTEST_PATH_SIZES, SHORTEST_PATH_DENSITIES, SHORTEST_PATH_HEURISTICS):
+        heuristic_type = SHORTEST_PATH_HEURISTICS[name]
+        rng = random.Random(SEED)
+        world = SnakeWorld(size, size, 0)
+        add_random_obstacles(world, density, rng)
+        queries = [
+            (random_free_position(world, rng), random_free_position(world, rng))
+            for _ in range(N_SEARCHES)
+        ]
+        workspace = world.get_search_workspace()
+
+        def run(_: None) -> int:
+            for src, dst in queries:
+                shortest_path(world, src, dst, heuristic_type(world, dst[0], dst[1]), workspace=workspace)
+            return len(queries)
+
+        params = {'size': size, 'density': density, 'heuristic': name}
+        yield {'benchmark': 'shortest_path', 'params': params, **measure(lambda: None, run, REPEAT)}
+
+
+def bench_simulate() -> Iterator[Result]:
+    for size in SIMULATE_SIZES:
+        def run(world: SnakeWorld) -> int:
+            for _ in range(N_SIMULATED_TICKS):
+                world.simulate()
+            return N_SIMULATED_TICKS
+
+        params = {'size': size, 'warmup_ticks': WARMUP_TICKS}
+        setup = lambda: mid_game_world(size, SEED, WARMUP_TICKS)[0]
+        yield {'benchmark': 'SnakeWorld.simulate', 'params': params, **measure(setup, run, REPEAT)}
+
+
+def bench_furthest_voronoi_vertex() -> Iterator[Result]:
+    for n_points in VORONOI_POINT_COUNTS:
+        rng = np.random.default_rng(SEED)
+        point_sets = [
+            rng.integers(0, VORONOI_GRID_SIZE, size=(n_points, 2)).astype(np.float64)
+            for _ in range(N_VORONOI_CALLS)
+        ]
+
+        def run(_: None) -> int:
+            for points in point_sets:
+                furthest_voronoi_vertex(points, VORONOI_GRID_SIZE, VORONOI_GRID_SIZE)
+            return len(point_sets)
+
+        params = {'points': n_points, 'grid_size': VORONOI_GRID_SIZE}
+        yield {'benchmark': 'furthest_voronoi_vertex', 'params': params, **measure(lambda: None, run, REPEAT)}
+
+
+def bench_find_spawn_pos() -> Iterator[Result]:
+    # same snake cell counts and grid as the Voronoi benchmark, which was used
+    # to find the spawn positions
+    for n_points in VORONOI_POINT_COUNTS:
+        rng = np.random.default_rng(SEED)
+        grids = []
+        for _ in range(N_VORONOI_CALLS):
+            obstacle_count = np.zeros((VORONOI_GRID_SIZE, VORONOI_GRID_SIZE), dtype=np.uint8)
+            x, y = rng.integers(0, VORONOI_GRID_SIZE, size=(2, n_points))
+            obstacle_count[x, y] = 1
+            grids.append(obstacle_count)
+
+        def run(_: None) -> int:
+            for obstacle_count in grids:
+                find_spawn_pos(obstacle_count, obstacle_count > 0, n_points)
+            return len(grids)
+
+        params = {'snake_cells': n_points, 'grid_size': VORONOI_GRID_SIZE}
+        yield {'benchmark': 'find_spawn_pos', 'params': params, **measure(lambda: None, run, REPEAT)}
+
+
+def bench_avoid() -> Iterator[Result]:
+    world, agents = mid_game_world(AGENT_GRID_SIZE, SEED, WARMUP_TICKS)
+    agent = next(a for a in agents if a.is_alive())
+    dangerous_agents = [a for a in world.iter_alive_agents() if a is not agent]
+
+    # the virtual obstacles are added by a round of start_avoid and removed
+    # before the next round, or added before a round of stop_avoid
+    danger_zones: list[list[list[Position]]] = []
+
+    def clear() -> None:
+        while len(danger_zones) > 0:
+            agent.stop_avoid(danger_zones.pop())
+
+    def fill() -> None:
+        clear()
+        for _ in range(N_AGENT_CALLS):
+            danger_zones.append(agent.start_avoid(dangerous_agents))
+
+    def run_start(_: None) -> int:
+        for _ in range(N_AGENT_CALLS):
+            danger_zones.append(agent.start_avoid(dangerous_agents))
+        return N_AGENT_CALLS
+
+    def run_stop(_: None) -> int:
+        clear()
+        return N_AGENT_CALLS
+
+    for caution in AVOID_CAUTIONS:
+        agent.caution_radius = caution
+        params = {'size': AGENT_GRID_SIZE, 'caution': caution, 'dangerous_agents': len(dangerous_agents)}
+        yield {'benchmark': 'AStarSnakeAgent.start_avoid', 'params': params, **measure(clear, run_start, REPEAT)}
+        yield {'benchmark': 'AStarSnakeAgent.stop_avoid', 'params': params, **measure(fill, run_stop, REPEAT)}
+        clear()
+
+
+def bench_compute_attack_path() -> Iterator[Result]:
+    world, agents = mid_game_world(AGENT_GRID_SIZE, SEED, WARMUP_TICKS)
+    agent = next(a for a in agents if a.is_alive())
+    targets = [a for a in world.iter_alive_agents() if a is not agent]
+
+    for anticipation in ATTACK_ANTICIPATIONS:
+        agent.attack_anticipation = anticipation
+
+        def run(_: None) -> int:
+            for _ in range(N_AGENT_CALLS):
+                agent.search_budget.start()
+                agent.compute_attack_path(targets)
+            return N_AGENT_CALLS
+
+        params = {'size': AGENT_GRID_SIZE, 'attack_anticipation': anticipation, 'targets': len(targets)}
+        yield {
+            'benchmark': 'AStarOffensiveSnakeAgent.compute_attack_path',
+            'params': params,
+            **measure(lambda: None, run, REPEAT)
+        }
+
+
+def bench_nearest_food() -> Iterator[Result]:
+    world, _ = mid_game_world(AGENT_GRID_SIZE, SEED, WARMUP_TICKS)
+    agents = list(world.iter_alive_agents())
+
+    for use_food_field in (False, True):
+        def run(_: None) -> int:
+            for _ in range(N_AGENT_CALLS):
+                # as during a tick, the food field is computed once for all
+                # the agents
+                world.food_field = None
+                for agent in agents:
+                    agent.use_food_field = use_food_field
+                    agent.search_budget.start()
+                    agent.compute_path_to_nearest_food()
+            return N_AGENT_CALLS
+
+        params = {'size': AGENT_GRID_SIZE, 'agents': len(agents), 'food_field': use_food_field}
+        yield {
+            'benchmark': 'AStarSnakeAgent.compute_path_to_nearest_food',
+            'params': params,
+            **measure(lambda: None, run, REPEAT)
+        }
+
+
+BENCHMARKS: dict[str, Callable[[], Iterator[Result]]] = {
+    'shortest_path': bench_shortest_path,
+    'simulate': bench_simulate,
+    'furthest_voronoi_vertex': bench_furthest_voronoi_vertex,
+    'find_spawn_pos': bench_find_spawn_pos,
+    'avoid': bench_avoid,
+    'compute_attack_path': bench_compute_attack_path,
+    'nearest_food': bench_nearest_food,
+}
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser(description="Times the hot paths of the back-end.")
+    parser.add_argument('--output', default=None,
+                        help="file in which to write the JSON results (default: standard output)")
+    parser.add_argument('--only', nargs='*', choices=BENCHMARKS, default=list(BENCHMARKS),
+                        help="benchmarks to run (default: all)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results = []
+    for name in args.only:
+        for result in BENCHMARKS[name]():
+            results.append(result)
+            print(f"{result['benchmark']} {result['params']}: {1e6 * result['median_s']:.1f} us", file=sys.stderr)
+
+    report = {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'seed': SEED,
+        'results': results,
+    }
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
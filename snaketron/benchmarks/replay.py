@@ -0,0 +1,115 @@
+"""Verifies that the replay files give back the recorded games, and measures
+their size with the speed of recording, replaying and seeking.
+
+Run from the `snaketron` directory with:
+    python -m benchmarks.replay
+"""
+from __future__ import annotations
+
+import os
+import random
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+import numpy as np
+from back.game import build_game
+from back.replay import TRAILER, ReplayReader, ReplayRecorder
+from back.world import SnakeWorld
+
+if TYPE_CHECKING:
+    from typing import Optional
+
+
+SIZE = 21
+N_FOOD = 3
+RESPAWN_COOLDOWN = 10
+N_TICKS = 5000
+KEYFRAME_INTERVAL = 128
+N_SEEKS = 200
+SEED = 0
+
+
+def snapshot(world: SnakeWorld) -> tuple:
+    bodies = {a.get_id(): list(a.pos) for a in world.iter_alive_agents()}
+    # the order of the agents dying together is drawn at random when the game
+    # is replayed, only the respawns are logged
+    dead_agents = sorted(a.get_id() for a in world.dead_agents)
+    return world.obstacle_count.copy(), set(world.iter_food()), bodies, dead_agents
+
+
+def same_state(expected: tuple, actual: tuple) -> bool:
+    return np.array_equal(expected[0], actual[0]) and expected[1:] == actual[1:]
+
+
+def play_game(n_ticks: int, recorder: Optional[ReplayRecorder]=None) -> float:
+    """Plays a game, recorded if a recorder is given, and returns the time
+    spent to simulate it.
+    """
+    world, _, _ = build_game(SIZE, SIZE, N_FOOD, 4, 0, RESPAWN_COOLDOWN, SEED)
+    world.set_recorder(recorder)
+    world.reset()
+    start = perf_counter()
+    for _ in range(n_ticks):
+        world.simulate()
+    return perf_counter() - start
+
+
+def game_states(n_ticks: int) -> list[tuple]:
+    """Plays the game again and returns the state of the world after each tick."""
+    world, _, _ = build_game(SIZE, SIZE, N_FOOD, 4, 0, RESPAWN_COOLDOWN, SEED)
+    world.reset()
+    states = [snapshot(world)]
+    for _ in range(n_ticks):
+        world.simulate()
+        states.append(snapshot(world))
+    return states
+
+
+def main() -> None:
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'game.snkr')
+        with ReplayRecorder(path, KEYFRAME_INTERVAL) as recorder:
+            recorded_elapsed = play_game(N_TICKS, recorder)
+        elapsed = play_game(N_TICKS)
+        states = game_states(N_TICKS)
+        size = os.path.getsize(path)
+        print(f"recorded {N_TICKS} ticks in {size} bytes ({size / N_TICKS:.1f} bytes/tick)")
+        print(f"simulation: {N_TICKS / elapsed:.0f} ticks/s, recorded: {N_TICKS / recorded_elapsed:.0f} ticks/s")
+
+        with ReplayReader(path) as reader:
+            assert len(reader) == N_TICKS
+
+            start = perf_counter()
+            for world in reader.play():
+                assert same_state(states[world.tick], snapshot(world)), f"state of tick {world.tick}"
+            print(f"replay: {N_TICKS} ticks identical, {N_TICKS / (perf_counter() - start):.0f} ticks/s (with checks)")
+
+            start = perf_counter()
+            n_records = sum(1 for _ in reader.iter_ticks())
+            print(f"scan: {n_records / (perf_counter() - start):.0f} records/s")
+
+            rng = random.Random(SEED)
+            ticks = [rng.randrange(N_TICKS + 1) for _ in range(N_SEEKS)]
+            start = perf_counter()
+            for tick in ticks:
+                world = reader.seek(tick)
+                assert same_state(states[tick], snapshot(world)), f"seek to tick {tick}"
+            print(f"seek: {N_SEEKS} random ticks identical, {1e3 * (perf_counter() - start) / N_SEEKS:.2f} ms/seek")
+
+        # a recording which has not been closed has no index and may end with
+        # a truncated record
+        truncated_path = os.path.join(tmp_dir, 'truncated.snkr')
+        with open(path, 'rb') as file:
+            data = file.read()
+        index_offset = TRAILER.unpack_from(data, len(data) - TRAILER.size)[1]
+        with open(truncated_path, 'wb') as file:
+            file.write(data[:index_offset - 3])
+        with ReplayReader(truncated_path) as reader:
+            tick = len(reader)
+            assert same_state(states[tick], snapshot(reader.seek(tick)))
+            print(f"unclosed recording: {tick} ticks recovered")
+
+
+if __name__ == '__main__':
+    main()
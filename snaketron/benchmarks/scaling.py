@@ -0,0 +1,113 @@
+"""Measures how the cost of a tick of a massive game grows with the number of
+snakes. By default the grid grows with the snakes so that each one has the same
+area, a tick then costing about the same time per alive snake when the engine
+scales linearly; `--size` keeps the grid size fixed instead.
+
+Run from the `snaketron` directory with:
+    python -m benchmarks.scaling --output scaling.json
+"""
+from __future__ import annotations
+
+import json
+import platform
+import sys
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from math import isqrt
+from statistics import median
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+import numpy as np
+from back.game import MASSIVE_VIEW_RADIUS, build_massive_game
+
+if TYPE_CHECKING:
+    from argparse import Namespace
+    from typing import Any, Optional
+    Result = dict[str, Any]
+
+
+SEED = 0
+SNAKE_COUNTS = (16, 32, 64, 128, 256)
+# side of the square area of the grid per snake
+AREA_SIDE_PER_SNAKE = 32
+RESPAWN_COOLDOWN = 10
+WARMUP_TICKS = 20
+N_MEASURED_TICKS = 50
+
+
+def measure_scaling(n_snakes: int, size: Optional[int], view_radius: int, n_ticks: int) -> Result:
+    if size is None:
+        size = isqrt(n_snakes * AREA_SIDE_PER_SNAKE ** 2)
+    # a food per snake
+    world, _, _ = build_massive_game(size, size, n_snakes, n_snakes, RESPAWN_COOLDOWN, SEED, view_radius)
+    world.reset()
+    for _ in range(WARMUP_TICKS):
+        world.simulate()
+
+    tick_times = []
+    alive_counts = []
+    for _ in range(n_ticks):
+        alive_counts.append(len(world.alive_agents))
+        start = perf_counter()
+        world.simulate()
+        tick_times.append(perf_counter() - start)
+
+    mean_alive = sum(alive_counts) / n_ticks
+    return {
+        'snakes': n_snakes,
+        'size': size,
+        'ticks': n_ticks,
+        'mean_alive': mean_alive,
+        'median_tick_s': median(tick_times),
+        'max_tick_s': max(tick_times),
+        'snake_tick_s': sum(tick_times) / sum(alive_counts) if sum(alive_counts) > 0 else 0.,
+    }
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser(description="Measures the tick cost of massive games as the snakes get more numerous.")
+    parser.add_argument('--output', default=None,
+                        help="file in which to write the JSON results (default: standard output)")
+    parser.add_argument('--snakes', type=int, nargs='*', default=list(SNAKE_COUNTS),
+                        help="numbers of snakes to measure")
+    parser.add_argument('--size', type=int, default=None,
+                        help="width and height of every grid (default: growing with the snakes)")
+    parser.add_argument('--view-radius', type=int, default=MASSIVE_VIEW_RADIUS)
+    parser.add_argument('--ticks', type=int, default=N_MEASURED_TICKS,
+                        help="ticks measured per game, after the warmup")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results = []
+    print(f"{'snakes':>7} {'size':>5} {'alive':>7} {'tick (ms)':>10} {'per snake (us)':>15}", file=sys.stderr)
+    for n_snakes in args.snakes:
+        result = measure_scaling(n_snakes, args.size, args.view_radius, args.ticks)
+        results.append(result)
+        print(
+            f"{n_snakes:>7} {result['size']:>5} {result['mean_alive']:>7.1f} "
+            f"{1e3 * result['median_tick_s']:>10.2f} {1e6 * result['snake_tick_s']:>15.1f}",
+            file=sys.stderr
+        )
+
+    report = {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'seed': SEED,
+        'view_radius': args.view_radius,
+        'results': results,
+    }
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Measures the node expansion throughput of `back.a_star.shortest_path` on
+toroidal grids of increasing size.
+
+Run from the `snaketron` directory with:
+    python -m benchmarks.shortest_path
+"""
+from __future__ import annotations
+
+import random
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from back.a_star import shortest_path
+from back.world import (EuclidianDistanceHeuristic,
+                        EuclidianDistancePeriodicHeuristic,
+                        ManhattanDistanceHeuristic, SnakeWorld)
+from benchmarks.common import add_random_obstacles, random_free_position
+
+if TYPE_CHECKING:
+    from typing import Iterator, Type
+
+    from back.type_hints import Direction, Position
+    from back.world import AbstractHeuristic
+
+
+GRID_SIZES = (21, 50, 100, 200)
+HEURISTICS = (
+    EuclidianDistanceHeuristic,
+    ManhattanDistanceHeuristic,
+    EuclidianDistancePeriodicHeuristic,
+)
+OBSTACLE_DENSITY = 0.2
+N_SEARCHES = 50
+SEED = 0
+
+
+class ExpansionCountingWorld(SnakeWorld):
+    """Snake world which counts the number of nodes expanded by the searches."""
+    def __init__(self, width: int, height: int) -> None:
+        super().__init__(width, height, 0)
+        self.expansion_count = 0
+
+    def iter_free_neighbors(self, p: Position) -> Iterator[tuple[Position, Direction]]:
+        self.expansion_count += 1
+        return super().iter_free_neighbors(p)
+
+
+def build_world(size: int, rng: random.Random) -> ExpansionCountingWorld:
+    world = ExpansionCountingWorld(size, size)
+    add_random_obstacles(world, OBSTACLE_DENSITY, rng)
+    return world
+
+
+def benchmark(size: int, heuristic_type: Type[AbstractHeuristic]) -> tuple[int, float]:
+    """Runs `N_SEARCHES` searches between random free positions and returns the
+    total number of expanded nodes with the elapsed time.
+    """
+    rng = random.Random(SEED)
+    world = build_world(size, rng)
+    queries = [
+        (random_free_position(world, rng), random_free_position(world, rng))
+        for _ in range(N_SEARCHES)
+    ]
+
+    workspace = world.get_search_workspace()
+    start = perf_counter()
+    for src, dst in queries:
+        shortest_path(world, src, dst, heuristic_type(world, dst[0], dst[1]), workspace=workspace)
+    elapsed = perf_counter() - start
+    return world.expansion_count, elapsed
+
+
+def main() -> None:
+    print(f"{'grid':>9} {'heuristic':>36} {'expansions':>12} {'time (s)':>10} {'expansions/s':>14}")
+    for size in GRID_SIZES:
+        for heuristic_type in HEURISTICS:
+            expansions, elapsed = benchmark(size, heuristic_type)
+            print(
+                f"{size:>4}x{size:<4} {heuristic_type.__name__:>36} {expansions:>12} "
+                f"{elapsed:>10.3f} {expansions / elapsed:>14.0f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Measures the cost of a tick for a single snake of increasing length, which
+should not depend on the length, next to the cost of the linear scan of its
+body that the self-collision check used to make.
+
+Run from the `snaketron` directory with:
+    python -m benchmarks.snake_length
+"""
+from __future__ import annotations
+
+from time import perf_counter
+
+from back.direction import RIGHT
+from back.world import SnakeWorld
+from benchmarks.common import ScriptedSnakeAgent
+
+SNAKE_LENGTHS = (10, 100, 1000, 10000, 50000)
+N_TICKS = 2000
+
+
+def benchmark(length: int) -> tuple[float, float]:
+    """Moves a snake around a ring one cell longer than itself, so that it
+    never bites its tail, and returns the time of a tick with the time of a
+    scan of its body.
+    """
+    world = SnakeWorld(length + 1, 1, 0)
+    agent = ScriptedSnakeAgent(world, [(x, 0) for x in range(length - 1, -1, -1)])
+    agent.dir = RIGHT
+    world.attach_agent(agent)
+    world.reset()
+
+    start = perf_counter()
+    for _ in range(N_TICKS):
+        world.simulate()
+    tick_time = (perf_counter() - start) / N_TICKS
+
+    start = perf_counter()
+    for _ in range(N_TICKS):
+        agent.pos.index(agent.get_head())
+    scan_time = (perf_counter() - start) / N_TICKS
+    return tick_time, scan_time
+
+
+def main() -> None:
+    print(f"{'length':>8} {'tick (us)':>10} {'body scan (us)':>15}")
+    for length in SNAKE_LENGTHS:
+        tick_time, scan_time = benchmark(length)
+        print(f"{length:>8} {1e6 * tick_time:>10.2f} {1e6 * scan_time:>15.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Measures the cold start of the entry points in fresh interpreters: the time
+to import each entry module, then to build a game and simulate its first tick,
+with the whole process lifetime. Lists the heavy optional dependencies each
+entry point imported, which should be none for the headless ones.
+
+Run from the `snaketron` directory with:
+    python -m benchmarks.startup --output startup.json
+"""
+from __future__ import annotations
+
+import json
+import platform
+import subprocess
+import sys
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from statistics import median
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from argparse import Namespace
+    from typing import Any
+    Result = dict[str, Any]
+
+
+ENTRY_MODULES = ('back.world', 'headless', 'tournament', 'benchmarks.hot_paths')
+HEAVY_MODULES = ('scipy', 'kivy', 'multiprocessing')
+REPEAT = 10
+
+# run by each fresh interpreter, which prints its timings as JSON
+CHILD_SCRIPT = '''
+import json, sys
+from time import perf_counter
+start = perf_counter()
+import {module}
+imported = perf_counter()
+from back.game import build_game
+world, _, _ = build_game(21, 21, 3, 4, 0, 10, 0)
+world.reset()
+world.simulate()
+first_tick = perf_counter()
+print(json.dumps({{
+    'import_s': imported - start,
+    'first_tick_s': first_tick - imported,
+    'heavy_modules': [m for m in {heavy_modules!r} if m in sys.modules],
+}}))
+'''
+
+
+def measure_entry(module: str, repeat: int) -> Result:
+    script = CHILD_SCRIPT.format(module=module, heavy_modules=HEAVY_MODULES)
+    import_times, first_tick_times, process_times = [], [], []
+    heavy_modules: list[str] = []
+    for _ in range(repeat):
+        start = perf_counter()
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, check=True, text=True).stdout
+        process_times.append(perf_counter() - start)
+        child = json.loads(output)
+        import_times.append(child['import_s'])
+        first_tick_times.append(child['first_tick_s'])
+        heavy_modules = child['heavy_modules']
+
+    return {
+        'entry': module,
+        'rounds': repeat,
+        'import_s': median(import_times),
+        'first_tick_s': median(first_tick_times),
+        'process_s': median(process_times),
+        'heavy_modules': heavy_modules,
+    }
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser(description="Measures the cold start of the entry points.")
+    parser.add_argument('--output', default=None,
+                        help="file in which to write the JSON results (default: standard output)")
+    parser.add_argument('--repeat', type=int, default=REPEAT,
+                        help="fresh interpreters started per entry point, whose median is reported")
+    parser.add_argument('--only', nargs='*', default=list(ENTRY_MODULES),
+                        help="entry modules to measure (default: all)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results = []
+    print(f"{'entry':>22} {'import (ms)':>12} {'first tick (ms)':>16} {'process (ms)':>13}  heavy imports", file=sys.stderr)
+    for module in args.only:
+        result = measure_entry(module, args.repeat)
+        results.append(result)
+        print(
+            f"{module:>22} {1e3 * result['import_s']:>12.1f} {1e3 * result['first_tick_s']:>16.1f} "
+            f"{1e3 * result['process_s']:>13.1f}  {', '.join(result['heavy_modules']) or '-'}",
+            file=sys.stderr
+        )
+
+    report = {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -28,6 +28,7 @@ class SnakeTronApp(App):
         ai_explanations: bool,
         layout_file: Path,
         color_file: Path,
+        texture_rendering: bool=False,
         **kwargs
     ) -> None:
         super().__init__(**kwargs)
@@ -38,6 +39,7 @@ class SnakeTronApp(App):
         self.ai_explanations = ai_explanations
         self.layout_file = layout_file
         self.color_file = color_file
+        self.texture_rendering = texture_rendering
 
     def build(self) -> None:
         with self.layout_file.open(mode='r') as fp:
@@ -54,6 +56,7 @@ class SnakeTronApp(App):
             self.ai_agents,
             self.time_step,
             self.ai_explanations,
-            colors
+            colors,
+            self.texture_rendering
         )
         return window
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+from kivy.graphics.texture import Texture
+
+if TYPE_CHECKING:
+    from typing import Iterator
+
+    from back.type_hints import Position
+    from front.type_hints import ColorValue
+
+
+TRANSPARENT = (0., 0., 0., 0.)
+# runs of changed rows separated by fewer unchanged rows are uploaded together,
+# a blit costing more than a few rows
+MAX_ROW_GAP = 8
+
+
+class GridTexture:
+    """RGBA image of a grid with a texel per cell, rasterized in a NumPy buffer
+    and uploaded to a texture by blitting the runs of rows which changed since
+    the previous upload.
+
+    The rows of the texture go from the bottom to the top of the grid, the
+    position (0, 0) being at its top left corner, as in `WorldDisplay`.
+    """
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.buffer = np.zeros((height, width, 4), dtype=np.uint8)
+        self.texture = Texture.create(size=(width, height), colorfmt='rgba', bufferfmt='ubyte')
+        self.texture.mag_filter = 'nearest'
+        self.texture.min_filter = 'nearest'
+        self.texels: dict[ColorValue, np.ndarray] = {}
+        self.dirty_rows = np.ones(height, dtype=np.bool_)
+        # the texture is emptied when the OpenGL context is lost, for example
+        # when the app is paused on Android, and is filled again from the buffer
+        self.texture.add_reload_observer(self._reload)
+
+    def _reload(self, texture: Texture) -> None:
+        texture.blit_buffer(
+            self.buffer.tobytes(),
+            pos=(0, 0),
+            size=(self.width, self.height),
+            colorfmt='rgba',
+            bufferfmt='ubyte'
+        )
+
+    def _texel(self, c: ColorValue) -> np.ndarray:
+        key = tuple(c)
+        texel = self.texels.get(key)
+        if texel is None:
+            texel = np.round(np.array(key) * 255).astype(np.uint8)
+            self.texels[key] = texel
+        return texel
+
+    def set_cell(self, pos: Position, c: ColorValue) -> None:
+        row = self.height - 1 - pos[1]
+        self.buffer[row, pos[0]] = self._texel(c)
+        self.dirty_rows[row] = True
+
+    def clear(self) -> None:
+        self.buffer.fill(0)
+        self.dirty_rows.fill(True)
+
+    def iter_dirty_runs(self) -> Iterator[tuple[int, int]]:
+        """Iterates over the runs of rows to upload, as (first row, row after
+        the last one) tuples.
+        """
+        dirty_rows = np.flatnonzero(self.dirty_rows)
+        if len(dirty_rows) == 0:
+            return
+        breaks = np.flatnonzero(np.diff(dirty_rows) > MAX_ROW_GAP + 1)
+        starts = np.concatenate(((dirty_rows[0],), dirty_rows[breaks + 1]))
+        stops = np.concatenate((dirty_rows[breaks] + 1, (dirty_rows[-1] + 1,)))
+        yield from zip(starts.tolist(), stops.tolist())
+
+    def upload(self) -> None:
+        """Blits the rows which changed into the texture."""
+        for start, stop in self.iter_dirty_runs():
+            self.texture.blit_buffer(
+                self.buffer[start:stop].tobytes(),
+                pos=(0, start),
+                size=(self.width, stop - start),
+                colorfmt='rgba',
+                bufferfmt='ubyte'
+            )
+        self.dirty_rows.fill(False)
@@ -11,6 +11,7 @@ if TYPE_CHECKING:
     from typing import Sequence
 
     from back.agent import AbstractSnakeAgent
+    from back.delta import WorldDelta
     from front.world_display import SnakeColors
 
 
@@ -41,6 +42,9 @@ class ScoreBoard(BoxLayout):
             self.labels[snake_id] = label
             self.add_widget(label)
 
-    def update_scores(self) -> None:
+    def update_scores(self, delta: WorldDelta) -> None:
+        """Updates the scores of the snakes whose length may have changed."""
         for snake in self.snakes:
-            self.labels[snake.get_id()].text = str(len(snake))
+            snake_id = snake.get_id()
+            if delta.reset or snake_id in delta.resized:
+                self.labels[snake_id].text = str(len(snake))
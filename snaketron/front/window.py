@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 from itertools import chain
+from time import perf_counter
 from typing import TYPE_CHECKING
 
+from back.delta import WorldDelta
 from front.controls import (KeyBoardControls, PlayerSwipeControl,
                             SwipeControlZone)
 from front.world_display import SnakeColors, WorldColors
@@ -22,13 +24,16 @@ if TYPE_CHECKING:
     from kivy.uix.widget import Widget
 
 
-MINIMAL_TIME_STEP = 0.01
+# in fast-forward, the game is stepped at every frame, for as many ticks as
+# can be simulated in this time (in seconds), and only the last one is drawn
+FAST_FORWARD_FRAME_BUDGET = 0.012
 
 
 class SnakeTronWindow(BoxLayout):
     app_background_color = ListProperty(get_color_from_hex('#000000'))
 
     world: SnakeWorld
+    delta: WorldDelta
     player_agents: Sequence[PlayerSnakeAgent]
     swipe_zones: list[SwipeControlZone]
     swipe_controls: list[PlayerSwipeControl]
@@ -62,11 +67,14 @@ class SnakeTronWindow(BoxLayout):
         ai_agents: Sequence[AbstractAISnakeAgent],
         time_step: float,
         ai_explanations: bool,
-        colors: dict
+        colors: dict,
+        texture_rendering: bool=False
     ) -> None:
         # link to the backend
         self.world = world
         self.player_agents = player_agents
+        self.delta = WorldDelta()
+        self.world.set_delta(self.delta)
         self.world.reset()
 
         # game speed
@@ -100,7 +108,7 @@ class SnakeTronWindow(BoxLayout):
             gridline=get_color_from_hex(colors['world']['gridline']),
             gridborder=get_color_from_hex(colors['world']['gridborder'])
         )
-        self.ids.world_display.init_logic(world, ai_agents, world_colors, agent_colors)
+        self.ids.world_display.init_logic(world, ai_agents, world_colors, agent_colors, texture_rendering)
         self.ids.score_board.init_logic(agents, agent_colors)
 
         # player keyboard inputs
@@ -130,9 +138,20 @@ class SnakeTronWindow(BoxLayout):
         self.clock_event = Clock.schedule_interval(self.game_step, self.time_step)
 
     def game_step(self, dt: float) -> None:
-        deads = self.world.simulate()
-        self.ids.world_display.update_draw(deads, self.ai_explanations)
-        self.ids.score_board.update_scores()
+        self.world.simulate()
+        if self.full_speed:
+            deadline = perf_counter() + FAST_FORWARD_FRAME_BUDGET
+            while perf_counter() < deadline:
+                self.world.simulate()
+        self.draw_world()
+
+    def draw_world(self) -> None:
+        """Draws the changes accumulated since the last drawing, the snakes
+        which died meanwhile flashing together.
+        """
+        self.ids.world_display.update_draw(self.delta, self.ai_explanations)
+        self.ids.score_board.update_scores(self.delta)
+        self.delta.clear()
         for controller in self.swipe_controls:
             controller.update_direction_display()
 
@@ -146,7 +165,7 @@ class SnakeTronWindow(BoxLayout):
     def toggle_fullspeed(self) -> None:
         self.full_speed = not self.full_speed
         if self.full_speed:
-            self.set_time_step(MINIMAL_TIME_STEP)
+            self.set_time_step(0)
         else:
             self.set_time_step(self.regular_time_step)
 
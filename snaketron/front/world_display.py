@@ -3,15 +3,18 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import TYPE_CHECKING
 
-from kivy.graphics import Color, Ellipse, InstructionGroup, Line, Rectangle
+from front.grid_texture import TRANSPARENT, GridTexture
+from kivy.graphics import (ClearBuffers, ClearColor, Color, Ellipse, Fbo,
+                           InstructionGroup, Line, Rectangle)
 from kivy.properties import NumericProperty
 from kivy.uix.floatlayout import FloatLayout
 from kivy.uix.widget import Widget
 
 if TYPE_CHECKING:
-    from typing import Iterable, Sequence
+    from typing import Iterator, Optional, Sequence
 
-    from back.agent import AbstractAISnakeAgent, AbstractSnakeAgent
+    from back.agent import AbstractAISnakeAgent
+    from back.delta import WorldDelta
     from back.type_hints import Position
     from back.world import SnakeWorld
     from front.type_hints import ColorValue, Coordinate
@@ -35,33 +38,87 @@ class SnakeColors:
 
 
 class WorldDisplay(FloatLayout):
+    """Draws a world, keeping an instruction group per snake cell and per food,
+    so that a tick only updates the instructions of what changed.
+
+    In texture mode, the cells are rasterized instead into a texture with a
+    texel per cell, drawn by a single rectangle, so that the cost of a frame
+    does not depend on the number of cells to draw. The foods are then drawn
+    as squares.
+    """
     square_size = NumericProperty(0.)
 
+    arena_fbo: Fbo
     instr_arena: InstructionGroup
-    instr_objs: InstructionGroup
+    instr_texture: InstructionGroup
+    instr_inspection: InstructionGroup
+    instr_snakes: InstructionGroup
+    instr_food: InstructionGroup
+    instr_killed: InstructionGroup
     world: SnakeWorld
     ai_snakes: Sequence[AbstractAISnakeAgent]
     world_colors: WorldColors
     snake_colors: dict[int, SnakeColors]
 
+    # number of cells of each agent on each position, with the agent owning
+    # each position, which is unique once a tick is over
+    cell_counts: dict[tuple[int, Position], int]
+    cell_owners: dict[Position, int]
+    heads: dict[int, Position]
+    cell_instrs: dict[Position, tuple[InstructionGroup, Color]]
+    food_instrs: dict[Position, InstructionGroup]
+    # layers of the texture mode
+    grid_texture: Optional[GridTexture]
+    texture_rect: Optional[Rectangle]
+    inspected_colors: dict[Position, ColorValue]
+    killed_colors: dict[Position, ColorValue]
+
     def on_kv_post(self, base_widget: Widget) -> None:
+        self.arena_fbo = Fbo(size=(1, 1))
         self.instr_arena = InstructionGroup()
-        self.instr_objs = InstructionGroup()
-        self.canvas.add(self.instr_arena)
-        self.canvas.add(self.instr_objs)
+        self.instr_texture = InstructionGroup()
+        self.instr_inspection = InstructionGroup()
+        self.instr_snakes = InstructionGroup()
+        self.instr_food = InstructionGroup()
+        self.instr_killed = InstructionGroup()
+        for instr in (
+            self.instr_arena, self.instr_texture,
+            self.instr_inspection, self.instr_snakes, self.instr_food, self.instr_killed
+        ):
+            self.canvas.add(instr)
+        self.cell_counts = {}
+        self.cell_owners = {}
+        self.heads = {}
+        self.cell_instrs = {}
+        self.food_instrs = {}
+        self.grid_texture = None
+        self.texture_rect = None
+        self.inspected_colors = {}
+        self.killed_colors = {}
 
     def init_logic(
         self,
         world: SnakeWorld,
         ai_snakes: Sequence[AbstractAISnakeAgent],
         world_colors: WorldColors,
-        snake_colors: dict[int, SnakeColors]
+        snake_colors: dict[int, SnakeColors],
+        texture_mode: bool=False
     ) -> None:
         self.world = world
         self.ai_snakes = ai_snakes
         self.world_colors = world_colors
         self.snake_colors = snake_colors
+        self.instr_texture.clear()
+        if texture_mode:
+            self.grid_texture = GridTexture(world.get_width(), world.get_height())
+            self.texture_rect = Rectangle(texture=self.grid_texture.texture)
+            self.instr_texture.add(Color(1., 1., 1., 1.))
+            self.instr_texture.add(self.texture_rect)
+        else:
+            self.grid_texture = None
+            self.texture_rect = None
         self.draw_arena()
+        self.redraw()
 
     def pos_to_coord(self, pos: Position) -> Coordinate:
         return (
@@ -69,80 +126,161 @@ class WorldDisplay(FloatLayout):
             self.y + (self.world.get_height() - 1 - pos[1]) * self.square_size
         )
 
-    def draw_square(self, x: float, y: float, c: ColorValue) -> None:
-        self.instr_objs.add(Color(*c))
-        self.instr_objs.add(Rectangle(pos=(x, y), size=(self.square_size, self.square_size)))
+    def draw_square(self, group: InstructionGroup, x: float, y: float, c: ColorValue) -> Color:
+        color = Color(*c)
+        group.add(color)
+        group.add(Rectangle(pos=(x, y), size=(self.square_size, self.square_size)))
+        return color
 
-    def draw_circle(self, x: float, y: float, c: ColorValue) -> None:
-        self.instr_objs.add(Color(*c))
-        self.instr_objs.add(Ellipse(pos=(x, y), size=(self.square_size, self.square_size)))
+    def draw_circle(self, group: InstructionGroup, x: float, y: float, c: ColorValue) -> Color:
+        color = Color(*c)
+        group.add(color)
+        group.add(Ellipse(pos=(x, y), size=(self.square_size, self.square_size)))
+        return color
 
-    def draw_arena(self) -> None:
-        self.instr_arena.clear()
+    def render_arena(self) -> None:
+        """Renders the static arena into the off-screen framebuffer, in the
+        coordinates of the widget relative to its position.
+        """
         h, w = self.world.get_height(), self.world.get_width()
+        arena_width, arena_height = w*self.square_size, h*self.square_size
+        # one more pixel so that the right and top borders are not clipped
+        self.arena_fbo.size = (int(arena_width) + 1, int(arena_height) + 1)
+        self.arena_fbo.clear()
+        self.arena_fbo.add(ClearColor(0, 0, 0, 0))
+        self.arena_fbo.add(ClearBuffers())
 
         # background
-        self.instr_arena.add(Color(*self.world_colors.background))
-        self.instr_arena.add(Rectangle(pos=self.pos, size=(w*self.square_size, h*self.square_size)))
+        self.arena_fbo.add(Color(*self.world_colors.background))
+        self.arena_fbo.add(Rectangle(pos=(0, 0), size=(arena_width, arena_height)))
 
         # grid lines every 3 cells
-        self.instr_arena.add(Color(*self.world_colors.gridline))
+        self.arena_fbo.add(Color(*self.world_colors.gridline))
         for u in range(3, w, 3):
-            x = self.x + u*self.square_size
-            y0 = self.y
-            y1 = self.y + h*self.square_size
-            self.instr_arena.add(Line(points=(x, y0, x, y1)))
+            x = u*self.square_size
+            self.arena_fbo.add(Line(points=(x, 0, x, arena_height)))
         for v in range(3, h, 3):
-            y = self.y + (h-v)*self.square_size
-            x0 = self.x
-            x1 = self.x + w*self.square_size
-            self.instr_arena.add(Line(points=(x0, y, x1, y)))
+            y = (h-v)*self.square_size
+            self.arena_fbo.add(Line(points=(0, y, arena_width, y)))
 
         # grid border
-        self.instr_arena.add(Color(*self.world_colors.gridborder))
-        self.instr_arena.add(Line(points=(
-            self.x, self.y,
-            self.x + w*self.square_size, self.y
-        )))
-        self.instr_arena.add(Line(points=(
-            self.x, self.y + h*self.square_size,
-            self.x + w*self.square_size, self.y + h*self.square_size
-        )))
-        self.instr_arena.add(Line(points=(
-            self.x, self.y,
-            self.x, self.y + h*self.square_size
-        )))
-        self.instr_arena.add(Line(points=(
-            self.x + w*self.square_size, self.y,
-            self.x + w*self.square_size, self.y + h*self.square_size
-        )))
+        self.arena_fbo.add(Color(*self.world_colors.gridborder))
+        self.arena_fbo.add(Line(points=(0, 0, arena_width, 0)))
+        self.arena_fbo.add(Line(points=(0, arena_height, arena_width, arena_height)))
+        self.arena_fbo.add(Line(points=(0, 0, 0, arena_height)))
+        self.arena_fbo.add(Line(points=(arena_width, 0, arena_width, arena_height)))
 
-    def draw_ai_inspection(self) -> None:
+    def draw_arena(self) -> None:
+        """Draws the arena cached in the off-screen framebuffer, which is only
+        rendered again when the size of the squares or the colors change.
+        """
+        self.render_arena()
+        self.instr_arena.clear()
+        self.instr_arena.add(self.arena_fbo)
+        self.instr_arena.add(Color(1., 1., 1., 1.))
+        self.instr_arena.add(Rectangle(texture=self.arena_fbo.texture, pos=self.pos, size=self.arena_fbo.size))
+
+    def set_world_colors(self, world_colors: WorldColors) -> None:
+        """Changes the colors of the world, and draws it again."""
+        self.world_colors = world_colors
+        self.draw_arena()
+        self.redraw()
+
+    def iter_inspected_cells(self) -> Iterator[tuple[Position, ColorValue]]:
         for snake in self.ai_snakes:
             color = self.snake_colors[snake.get_id()].inspect
             for pos in snake.inspect():
-                x, y = self.pos_to_coord(pos)
-                self.draw_square(x, y, color)
+                yield pos, color
 
-    def draw_alive_snakes(self) -> None:
-        for snake in self.world.iter_alive_agents():
-            colors = self.snake_colors[snake.get_id()]
-            cells = list(snake.iter_cells())
-            for i, pos in enumerate(cells):
-                x, y = self.pos_to_coord(pos)
-                self.draw_square(x, y, colors.head if i == 0 else colors.tail)
+    def draw_ai_inspection(self) -> None:
+        self.instr_inspection.clear()
+        for pos, color in self.iter_inspected_cells():
+            x, y = self.pos_to_coord(pos)
+            self.draw_square(self.instr_inspection, x, y, color)
 
-    def draw_food(self) -> None:
-        for food in self.world.iter_food():
-            x, y = self.pos_to_coord(food)
-            self.draw_circle(x, y, self.world_colors.food)
+    def snake_cell_color(self, pos: Position) -> Optional[ColorValue]:
+        """Returns the color of the snake owning the position `pos`, or None if
+        no snake owns it.
+        """
+        owner = self.cell_owners.get(pos)
+        if owner is None:
+            return None
+        colors = self.snake_colors[owner]
+        return colors.head if self.heads.get(owner) == pos else colors.tail
 
-    def draw_killed_snakes(self, dead_snakes: Iterable[AbstractSnakeAgent]) -> None:
-        for snake in dead_snakes:
-            color = self.snake_colors[snake.get_id()].dead
-            for pos in snake.iter_cells():
+    def draw_snake_cell(self, pos: Position) -> None:
+        """Draws the position `pos` with the color of the snake owning it, or
+        removes its square if no snake owns it anymore.
+        """
+        c = self.snake_cell_color(pos)
+        instrs = self.cell_instrs.get(pos)
+        if c is None:
+            if instrs is not None:
+                self.instr_snakes.remove(instrs[0])
+                del self.cell_instrs[pos]
+        elif instrs is None:
+            group = InstructionGroup()
+            x, y = self.pos_to_coord(pos)
+            self.cell_instrs[pos] = group, self.draw_square(group, x, y, c)
+            self.instr_snakes.add(group)
+        else:
+            instrs[1].rgba = c
+
+    def draw_food(self, pos: Position) -> None:
+        group = InstructionGroup()
+        x, y = self.pos_to_coord(pos)
+        self.draw_circle(group, x, y, self.world_colors.food)
+        self.food_instrs[pos] = group
+        self.instr_food.add(group)
+
+    def erase_food(self, pos: Position) -> None:
+        self.instr_food.remove(self.food_instrs.pop(pos))
+
+    def draw_killed_snakes(self, deaths: Sequence[tuple[int, Sequence[Position]]]) -> None:
+        self.instr_killed.clear()
+        for snake_id, cells in deaths:
+            color = self.snake_colors[snake_id].dead
+            for pos in cells:
                 x, y = self.pos_to_coord(pos)
-                self.draw_square(x, y, color)
+                self.draw_square(self.instr_killed, x, y, color)
+
+    def texel_color(self, pos: Position) -> ColorValue:
+        """Returns the color of the position `pos` in texture mode, the layers
+        being stacked as the instruction groups.
+        """
+        c = self.killed_colors.get(pos)
+        if c is not None:
+            return c
+        if self.world.pos_has_food(pos):
+            return self.world_colors.food
+        c = self.snake_cell_color(pos)
+        if c is not None:
+            return c
+        return self.inspected_colors.get(pos, TRANSPARENT)
+
+    def update_texture(
+        self,
+        changed: set[Position],
+        deaths: Sequence[tuple[int, Sequence[Position]]],
+        ai_explanations: bool
+    ) -> None:
+        """Rasterizes the positions which changed, with the positions of the
+        previous and the new flashes and inspections, then uploads them.
+        """
+        changed.update(self.killed_colors)
+        changed.update(self.inspected_colors)
+        self.killed_colors = {}
+        for snake_id, cells in deaths:
+            color = self.snake_colors[snake_id].dead
+            for pos in cells:
+                self.killed_colors[pos] = color
+        self.inspected_colors = dict(self.iter_inspected_cells()) if ai_explanations else {}
+        changed.update(self.killed_colors)
+        changed.update(self.inspected_colors)
+
+        for pos in changed:
+            self.grid_texture.set_cell(pos, self.texel_color(pos))
+        self.grid_texture.upload()
 
     def recompute_square_size(self) -> None:
         self.square_size = min(
@@ -152,16 +290,88 @@ class WorldDisplay(FloatLayout):
 
     def on_square_size(self, instance: Widget, value: float) -> None:
         self.draw_arena()
-        self.update_draw()
+        if self.texture_rect is not None:
+            self.texture_rect.pos = self.pos
+            self.texture_rect.size = (
+                self.world.get_width() * self.square_size,
+                self.world.get_height() * self.square_size
+            )
+        else:
+            # the squares of the cells are positioned in the widget
+            self.redraw()
+
+    def redraw(self, ai_explanations: bool=False) -> None:
+        """Draws the whole current state of the world again."""
+        for group in (self.instr_inspection, self.instr_snakes, self.instr_food, self.instr_killed):
+            group.clear()
+        self.cell_counts.clear()
+        self.cell_owners.clear()
+        self.cell_instrs.clear()
+        self.food_instrs.clear()
+
+        self.heads = {snake.get_id(): snake.get_head() for snake in self.world.iter_alive_agents()}
+        for snake in self.world.iter_alive_agents():
+            snake_id = snake.get_id()
+            for pos in snake.iter_cells():
+                key = (snake_id, pos)
+                self.cell_counts[key] = self.cell_counts.get(key, 0) + 1
+                self.cell_owners[pos] = snake_id
+
+        if self.grid_texture is not None:
+            self.grid_texture.clear()
+            self.killed_colors = {}
+            self.inspected_colors = {}
+            self.update_texture(set(self.cell_owners).union(self.world.iter_food()), (), ai_explanations)
+            return
+
+        if ai_explanations:
+            self.draw_ai_inspection()
+        for pos in self.cell_owners:
+            self.draw_snake_cell(pos)
+        for pos in self.world.iter_food():
+            self.draw_food(pos)
+
+    def update_draw(self, delta: WorldDelta, ai_explanations: bool=False) -> None:
+        """Updates the drawing with the changes of the world since the last
+        update, and flashes the snakes which died meanwhile.
+        """
+        if delta.reset:
+            self.redraw(ai_explanations)
+            return
+
+        changed = set()
+        for snake_id, pos, change in delta.iter_cell_changes():
+            key = (snake_id, pos)
+            count = self.cell_counts.get(key, 0) + change
+            if count == 0:
+                del self.cell_counts[key]
+                if self.cell_owners.get(pos) == snake_id:
+                    del self.cell_owners[pos]
+            else:
+                self.cell_counts[key] = count
+                self.cell_owners[pos] = snake_id
+            changed.add(pos)
+
+        # the previous heads are drawn again with the color of a tail
+        old_heads = self.heads
+        self.heads = {snake.get_id(): snake.get_head() for snake in self.world.iter_alive_agents()}
+        changed.update(old_heads.values())
+        changed.update(self.heads.values())
+
+        if self.grid_texture is not None:
+            changed.update(delta.iter_eaten_food())
+            changed.update(delta.iter_spawned_food())
+            self.update_texture(changed, delta.deaths, ai_explanations)
+            return
 
-    def update_draw(
-        self,
-        dead_snakes: Iterable[AbstractSnakeAgent]=(),
-        ai_explanations: bool=False
-    ) -> None:
-        self.instr_objs.clear()
         if ai_explanations:
             self.draw_ai_inspection()
-        self.draw_alive_snakes()
-        self.draw_food()
-        self.draw_killed_snakes(dead_snakes)
+        else:
+            self.instr_inspection.clear()
+        for pos in changed:
+            self.draw_snake_cell(pos)
+        for pos in delta.iter_eaten_food():
+            self.erase_food(pos)
+        for pos in delta.iter_spawned_food():
+            self.draw_food(pos)
+        self.draw_killed_snakes(delta.deaths)
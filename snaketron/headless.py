@@ -0,0 +1,111 @@
+"""Runs games without any display, and reports the simulation throughput with
+the outcome of each game. Neither Kivy nor any front-end module is imported.
+
+Run from the `snaketron` directory with:
+    python headless.py --games 10 --ticks 1000
+"""
+from __future__ import annotations
+
+import os
+from argparse import ArgumentParser
+from typing import TYPE_CHECKING
+
+from back.agent import AStarSnakeAgent
+from back.game import MASSIVE_VIEW_RADIUS, build_game, build_massive_game
+from back.profiler import TickProfiler
+from back.replay import ReplayRecorder
+from back.simulation import run_game
+
+if TYPE_CHECKING:
+    from argparse import Namespace
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser(description="Runs snake games without display.")
+    parser.add_argument('--width', type=int, default=21)
+    parser.add_argument('--height', type=int, default=21)
+    parser.add_argument('--snakes', type=int, default=4,
+                        help="number of snakes, at most 4 unless --massive is given")
+    parser.add_argument('--massive', action='store_true',
+                        help="plays a game between many AI snakes which only see their neighborhood")
+    parser.add_argument('--view-radius', type=int, default=MASSIVE_VIEW_RADIUS,
+                        help="distance up to which the snakes of a massive game see")
+    parser.add_argument('--players', type=int, default=0,
+                        help="number of player snakes, which never turn without input")
+    parser.add_argument('--food', type=int, default=None,
+                        help="number of foods (default: number of snakes - 1)")
+    parser.add_argument('--respawn-cooldown', type=int, default=10,
+                        help="negative to never respawn the dead snakes")
+    parser.add_argument('--ticks', type=int, default=1000,
+                        help="maximal number of ticks per game, negative for no limit")
+    parser.add_argument('--games', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0,
+                        help="seed of the first game, incremented for each game")
+    parser.add_argument('--node-budget', type=int, default=None,
+                        help="positions the searches of an AI snake may expand per tick (default: grid area)")
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help="milliseconds the searches of an AI snake may last per tick")
+    parser.add_argument('--record-dir', default=None,
+                        help="directory in which to write the replay file of each game")
+    parser.add_argument('--profile', action='store_true',
+                        help="report the time spent in each phase of the ticks")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    n_food = max(args.snakes - 1, 0) if args.food is None else args.food
+    respawn_cooldown = args.respawn_cooldown if args.respawn_cooldown >= 0 else None
+
+    total_ticks = 0
+    total_elapsed = 0.
+    profiler = TickProfiler() if args.profile else None
+    if args.record_dir is not None:
+        os.makedirs(args.record_dir, exist_ok=True)
+    for game_idx in range(args.games):
+        time_budget = None if args.time_budget is None else args.time_budget / 1e3
+        if args.massive:
+            world, _, ai_agents = build_massive_game(
+                args.height, args.width, n_food, args.snakes, respawn_cooldown, seed=args.seed + game_idx,
+                view_radius=args.view_radius, node_budget=args.node_budget, time_budget=time_budget
+            )
+        else:
+            world, _, ai_agents = build_game(
+                args.height, args.width, n_food, args.snakes, args.players, respawn_cooldown,
+                seed=args.seed + game_idx, node_budget=args.node_budget, time_budget=time_budget
+            )
+        world.set_profiler(profiler)
+        if args.record_dir is None:
+            result = run_game(world, args.ticks)
+        else:
+            replay_path = os.path.join(args.record_dir, f"game_{args.seed + game_idx}.snkr")
+            with ReplayRecorder(replay_path) as recorder:
+                world.set_recorder(recorder)
+                result = run_game(world, args.ticks)
+        total_ticks += result.ticks
+        total_elapsed += result.elapsed
+
+        lengths = ' '.join(f"{agent_id}:{length}" for agent_id, length in result.lengths.items())
+        deaths = ' '.join(f"{agent_id}:{n}" for agent_id, n in result.deaths.items())
+        missed = ' '.join(f"{agent.get_id()}:{agent.get_missed_deadlines()}" for agent in ai_agents)
+        # paths to a food reused out of the paths to a food needed
+        reuse_stats = []
+        for agent in ai_agents:
+            if isinstance(agent, AStarSnakeAgent):
+                hits, misses = agent.get_path_cache_stats()
+                reuse_stats.append(f"{agent.get_id()}:{hits}/{hits + misses}")
+        reuse = ' '.join(reuse_stats)
+        print(
+            f"game {game_idx}: {result.ticks} ticks, {result.ticks_per_second():.1f} ticks/s, "
+            f"{result.ending}, winner={result.winner}, lengths=[{lengths}], deaths=[{deaths}], "
+            f"missed deadlines=[{missed}], path reuse=[{reuse}]"
+        )
+
+    if total_elapsed > 0:
+        print(f"total: {total_ticks} ticks in {total_elapsed:.3f} s, {total_ticks / total_elapsed:.1f} ticks/s")
+    if profiler is not None:
+        print(profiler.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Plays many headless games between differently configured AI snakes in a
+pool of processes, and reports the win rate, survival and score of each
+configuration.
+
+Run from the `snaketron` directory with:
+    python tournament.py --games 200 --workers 8
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from back.tournament import (MAX_SEATS, AgentSpec, aggregate, make_matches,
+                             run_tournament)
+
+if TYPE_CHECKING:
+    from argparse import Namespace
+
+
+DEFAULT_ROSTER = (
+    AgentSpec('euclidian', caution=1, attack_anticipation=6),
+    AgentSpec('euclidian', caution=1, attack_anticipation=12),
+    AgentSpec('euclidian', caution=0, attack_anticipation=6),
+    AgentSpec('manhattan', caution=3, attack_anticipation=6),
+    AgentSpec('manhattan', caution=1, attack_anticipation=12),
+    AgentSpec('euclidian_periodic', caution=1, attack_anticipation=6),
+)
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser(description="Plays a tournament between AI snakes.")
+    parser.add_argument('--games', type=int, default=100)
+    # the agents of a game have distinct configurations
+    max_seats = min(MAX_SEATS, len(DEFAULT_ROSTER))
+    parser.add_argument('--seats', type=int, default=4, choices=range(1, max_seats + 1),
+                        help="number of snakes per game")
+    parser.add_argument('--workers', type=int, default=None, help="default: one per core")
+    parser.add_argument('--width', type=int, default=21)
+    parser.add_argument('--height', type=int, default=21)
+    parser.add_argument('--food', type=int, default=3)
+    parser.add_argument('--respawn-cooldown', type=int, default=-1,
+                        help="negative to never respawn the dead snakes")
+    parser.add_argument('--ticks', type=int, default=1000, help="maximal number of ticks per game")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    respawn_cooldown = args.respawn_cooldown if args.respawn_cooldown >= 0 else None
+    matches = make_matches(
+        DEFAULT_ROSTER, args.games, args.seats,
+        args.width, args.height, args.food, respawn_cooldown, args.ticks, args.seed
+    )
+
+    start = perf_counter()
+    results = list(run_tournament(matches, args.workers))
+    elapsed = perf_counter() - start
+    total_ticks = sum(record.ticks for _, record in results)
+
+    stats = aggregate(results)
+    print(f"{'agent':>54} {'games':>6} {'win rate':>9} {'survival':>9} {'length':>7} {'deaths':>7}")
+    for agent_spec, agent_stats in sorted(stats.items(), key=lambda item: -item[1].win_rate()):
+        print(
+            f"{str(agent_spec):>54} {agent_stats.games:>6} {agent_stats.win_rate():>9.3f} "
+            f"{agent_stats.survival():>9.3f} {agent_stats.mean_length():>7.1f} {agent_stats.total_deaths:>7}"
+        )
+    print(
+        f"{len(results)} games, {total_ticks} ticks in {elapsed:.2f} s: "
+        f"{len(results) / elapsed:.2f} games/s, {total_ticks / elapsed:.0f} ticks/s"
+    )
+
+
+if __name__ == '__main__':
+    main()